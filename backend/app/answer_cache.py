@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+from .config import get_settings
+from .embeddings import get_embeddings
+
+settings = get_settings()
+
+
+@dataclass
+class _Entry:
+    question: str
+    vector: np.ndarray  # unit-normalized question embedding
+    answer: str
+    k: int
+    citations: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """Per-publication QA answers, matched on question-embedding cosine similarity.
+
+    Entries are tagged with the publication's index version (the tombstone seq
+    of its latest ingest); a re-ingest bumps that version, so older answers
+    stop matching and are dropped on the next lookup. Entries expire after
+    `ttl_s` and the least recently used are evicted past `max_entries`.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_s: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        # (pub_id, version) -> OrderedDict[entry_id, _Entry]; global LRU order kept in _lru
+        self._by_pub: Dict[tuple, "OrderedDict[int, _Entry]"] = {}
+        self._lru: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, entry_id: int) -> None:
+        key = self._lru.pop(entry_id, None)
+        if key is not None:
+            entries = self._by_pub.get(key)
+            if entries is not None:
+                entries.pop(entry_id, None)
+                if not entries:
+                    del self._by_pub[key]
+
+    def _drop_stale_versions(self, pub_id: int, version: int) -> None:
+        for key in [k for k in self._by_pub if k[0] == pub_id and k[1] != version]:
+            for entry_id in list(self._by_pub[key]):
+                self._drop(entry_id)
+
+    def get(self, pub_id: int, version: int, vector: np.ndarray, k: int) -> Optional[tuple[_Entry, float]]:
+        """Best stored answer for a question within the similarity threshold, as (entry, similarity)."""
+        now = time.time()
+        with self._lock:
+            self._drop_stale_versions(pub_id, version)
+            entries = self._by_pub.get((pub_id, version))
+            if entries and self.ttl_s:
+                for entry_id in [i for i, e in entries.items() if now - e.created_at > self.ttl_s]:
+                    self._drop(entry_id)
+                entries = self._by_pub.get((pub_id, version))
+            candidates = [(i, e) for i, e in (entries or {}).items() if e.k == k]
+            if candidates:
+                sims = np.stack([e.vector for _, e in candidates]) @ vector
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._lru.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry, float(sims[best])
+            self.misses += 1
+            return None
+
+    def put(self, pub_id: int, version: int, entry: _Entry) -> None:
+        with self._lock:
+            self._drop_stale_versions(pub_id, version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._by_pub.setdefault((pub_id, version), OrderedDict())[entry_id] = entry
+            self._lru[entry_id] = (pub_id, version)
+            while self.max_entries and len(self._lru) > self.max_entries:
+                self._drop(next(iter(self._lru)))
+
+    def invalidate(self, pub_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._by_pub if k[0] == pub_id]:
+                for entry_id in list(self._by_pub[key]):
+                    self._drop(entry_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "publications": len({k[0] for k in self._by_pub}),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "llm_calls_saved": self.hits,
+            }
+
+
+_cache: Optional[SemanticAnswerCache] = (
+    SemanticAnswerCache(settings.ANSWER_CACHE_THRESHOLD, settings.ANSWER_CACHE_MAX_ENTRIES, settings.ANSWER_CACHE_TTL_S)
+    if settings.ANSWER_CACHE_ENABLED else None
+)
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    return _cache
+
+
+def answer_cache_stats() -> Optional[dict]:
+    return _cache.stats() if _cache is not None else None
+
+
+def invalidate_answers(pub_id: int) -> None:
+    if _cache is not None:
+        _cache.invalidate(pub_id)
+
+
+async def embed_question(question: str) -> tuple[np.ndarray, np.ndarray]:
+    """(raw, unit-normalized) question embedding from one provider call.
+
+    The unit vector is matched against the cache (dot product == cosine
+    similarity); the raw one can be handed to retrieval so a cache miss does
+    not embed the question a second time.
+    """
+    vec = np.asarray(await get_embeddings().aembed_query(question), dtype="float32")
+    norm = float(np.linalg.norm(vec))
+    return vec, (vec / norm if norm else vec)
+
+
+def new_entry(question: str, vector: np.ndarray, answer: str, k: int, citations: Optional[List[dict]] = None) -> _Entry:
+    return _Entry(question=question, vector=vector, answer=answer, k=k, citations=citations or [])
@@ -0,0 +1,109 @@
+"""Benchmark single-document QA context assembly over a fixed question set.
+
+    python -m app.bench_context [--ids 1,2,3] [--k 6] [--generate] [--out answers.jsonl]
+
+For every (publication, question) pair the top-k chunks are retrieved once and
+turned into a prompt two ways: `naive` (each chunk as its own [n] block, the
+pre-merge behaviour) and `packed` (`rag_graph.assemble_context`: overlapping
+chunks merged, QA_CONTEXT_TOKENS budget). Prompt tokens are always reported;
+--generate also times the LLM on both prompts and --out writes both answers
+side by side for a quality review.
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import List
+from langchain.schema import Document
+from .db import SessionLocal, init_db
+from . import models
+from .chunking import token_len
+from .rag_graph import QA_PROMPT, _llm, assemble_context
+from .vectorstore import has_publication_index, publication_similarity_search
+
+QUESTIONS = [
+    "What organism was studied?",
+    "What were the main findings?",
+    "What methods were used?",
+    "How long was the exposure to spaceflight or simulated microgravity?",
+    "What limitations do the authors mention?",
+    "What changes were observed compared to ground controls?",
+    "What are the implications for long-duration missions?",
+    "What future research do the authors recommend?",
+]
+
+
+def _naive_context(docs: List[Document]) -> str:
+    return "\n\n".join(f"[{i}] {d.page_content[:1200]}" for i, d in enumerate(docs, start=1))
+
+
+def _prompt_tokens(question: str, context: str) -> int:
+    return sum(token_len(m.content) for m in QA_PROMPT.format_messages(question=question, context=context))
+
+
+def bench(ids: List[int] | None = None, questions: List[str] = QUESTIONS, k: int = 6, generate: bool = False, out: str | None = None) -> None:
+    init_db()
+    db = SessionLocal()
+    try:
+        query = db.query(models.Publication.id).order_by(models.Publication.id)
+        if ids:
+            query = query.filter(models.Publication.id.in_(ids))
+        pub_ids = [pid for (pid,) in query if has_publication_index(pid)]
+    finally:
+        db.close()
+
+    tokens = {"naive": [], "packed": []}
+    latency = {"naive": [], "packed": []}
+    sink = open(out, "w", encoding="utf-8") if out else None
+    chain = QA_PROMPT | _llm() if generate else None
+    try:
+        for pid in pub_ids:
+            for q in questions:
+                docs = publication_similarity_search(pid, q, k=k)
+                if not docs:
+                    continue
+                contexts = {"naive": _naive_context(docs), "packed": assemble_context(docs)[0]}
+                row = {"publication_id": pid, "question": q}
+                for name, context in contexts.items():
+                    tokens[name].append(_prompt_tokens(q, context))
+                    if chain is not None:
+                        t0 = time.perf_counter()
+                        row[name] = chain.invoke({"question": q, "context": context}).content
+                        latency[name].append(time.perf_counter() - t0)
+                if sink is not None:
+                    sink.write(json.dumps(row) + "\n")
+    finally:
+        if sink is not None:
+            sink.close()
+
+    if not tokens["naive"]:
+        print("No indexed publications to benchmark.")
+        return
+    print(f"{len(tokens['naive'])} questions over {len(pub_ids)} publications (k={k})")
+    for name in ("naive", "packed"):
+        line = f"  {name:6s} prompt tokens: mean {statistics.mean(tokens[name]):.0f}, total {sum(tokens[name])}"
+        if latency[name]:
+            line += f"; generation mean {statistics.mean(latency[name]):.2f}s"
+        print(line)
+    saved = 1 - sum(tokens["packed"]) / sum(tokens["naive"])
+    print(f"  packed saves {saved:.1%} of prompt tokens")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare naive and packed QA context assembly.")
+    ap.add_argument("--ids", help="comma-separated publication ids (default: all indexed)")
+    ap.add_argument("--k", type=int, default=6, help="chunks retrieved per question")
+    ap.add_argument("--questions", help="file with one question per line (default: built-in set)")
+    ap.add_argument("--generate", action="store_true", help="also time answer generation with both contexts")
+    ap.add_argument("--out", help="write both answers per question to this JSONL file (needs --generate)")
+    args = ap.parse_args()
+    ids = [int(i) for i in args.ids.split(",")] if args.ids else None
+    questions = QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    bench(ids=ids, questions=questions, k=args.k, generate=args.generate, out=args.out)
+
+
+if __name__ == "__main__":
+    main()
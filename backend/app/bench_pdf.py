@@ -0,0 +1,68 @@
+"""Benchmark PDF text extraction: serial vs the per-page process pool.
+
+    python -m app.bench_pdf paper.pdf [--workers 8] [--repeat 3]
+
+Reports, for each mode, total extraction time, time until the first chunk is
+emitted by the streaming chunker (how early chunking/embedding can start) and
+peak Python memory while extracting. Use a multi-hundred-page PDF.
+"""
+import argparse
+import time
+import tracemalloc
+from .chunking import chunk_pages
+from .config import get_settings
+from .ingestion import iter_pdf_pages
+
+settings = get_settings()
+
+
+def _run(path: str, parallel: bool) -> dict:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    first_chunk = None
+    pages = 0
+    chunks = 0
+
+    def _pages():
+        nonlocal pages
+        for page in iter_pdf_pages(path, parallel=parallel):
+            pages += 1
+            yield page
+
+    for _ in chunk_pages(_pages()):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - t0
+        chunks += 1
+    total = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"pages": pages, "chunks": chunks, "total_s": total, "first_chunk_s": first_chunk or total, "peak_mb": peak / 1e6}
+
+
+def bench(path: str, repeat: int = 3) -> None:
+    print(f"{path}: PDF_WORKERS={settings.PDF_WORKERS}, PDF_PARALLEL_MIN_PAGES={settings.PDF_PARALLEL_MIN_PAGES}")
+    results = {}
+    for name, parallel in (("serial", False), ("parallel", True)):
+        runs = [_run(path, parallel) for _ in range(max(1, repeat))]
+        best = min(runs, key=lambda r: r["total_s"])
+        results[name] = best
+        print(
+            f"  {name:8s} {best['pages']} pages, {best['chunks']} chunks: total {best['total_s']:.2f}s, "
+            f"first chunk after {best['first_chunk_s']:.2f}s, peak {best['peak_mb']:.1f} MB"
+        )
+    print(f"  speedup x{results['serial']['total_s'] / results['parallel']['total_s']:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare serial and parallel PDF page extraction.")
+    ap.add_argument("pdf")
+    ap.add_argument("--workers", type=int, help="override PDF_WORKERS")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per mode (best is reported)")
+    args = ap.parse_args()
+    if args.workers:
+        settings.PDF_WORKERS = args.workers
+    bench(args.pdf, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark global search latency: cold index load per query vs the resident index.
+
+    python -m app.bench_search [--queries 50] [--k 10]
+
+`cold` rebuilds the index view from disk for every query (manifest, every
+segment's FAISS file and pickled docstore), which is what each search used to
+pay. `resident` serves every query from the process-wide `_global_index`.
+Query embeddings are computed once up front so only index work is timed.
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from .db import SessionLocal, init_db
+from . import models
+from .vectorstore import _GlobalIndexHolder, _embed_query, _global_index
+
+QUERIES = [
+    "bone loss in microgravity",
+    "muscle atrophy countermeasures",
+    "radiation effects on DNA repair",
+    "plant growth on the ISS",
+    "immune response during spaceflight",
+    "cardiovascular deconditioning",
+    "gene expression changes in mice",
+    "microbial biofilms in spacecraft",
+]
+
+
+def _percentiles(samples: list) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"p50 {statistics.median(ms):.1f}ms, p95 {p95:.1f}ms, max {ms[-1]:.1f}ms"
+
+
+def bench(n_queries: int = 50, k: int = 10) -> None:
+    init_db()
+    snap = _global_index.snapshot()
+    if not snap.segments:
+        print("Global index is empty; ingest some publications first.")
+        return
+    vectors = [_embed_query(q) for q in QUERIES]
+    queries = [vectors[i % len(vectors)] for i in range(n_queries)]
+    rows = sum(seg.vs.index.ntotal for seg in snap.segments)
+    db = SessionLocal()
+    try:
+        pubs = db.query(models.Publication.id).count()
+    finally:
+        db.close()
+    print(f"{pubs} publications, {rows} vectors in {len(snap.segments)} segments; {n_queries} queries, k={k}")
+
+    cold = []
+    for vec in queries:
+        t0 = time.perf_counter()
+        _GlobalIndexHolder().snapshot().search(np.asarray(vec), k)
+        cold.append(time.perf_counter() - t0)
+
+    resident = []
+    for vec in queries:
+        t0 = time.perf_counter()
+        _global_index.snapshot().search(np.asarray(vec), k)
+        resident.append(time.perf_counter() - t0)
+
+    print(f"  cold     {_percentiles(cold)}")
+    print(f"  resident {_percentiles(resident)}")
+    print(f"  speedup x{statistics.median(cold) / statistics.median(resident):.0f} (median)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare cold-load and resident global search latency.")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_args()
+    bench(n_queries=args.queries, k=args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Bulk corpus ingestion.
+
+    python -m app.bulk_ingest manifest.csv [--batch-size 25] [--pdf-workers 4] [--llm-workers 4] [--state PATH]
+
+The manifest is a CSV with a header row. Recognised columns: title (required),
+pdf_path or text_path (relative paths are resolved against the manifest's
+directory), abstract, date_year, date_month, organism, environment,
+original_link, authors (";"-separated names), category_id, subcategory_id.
+
+Papers are processed in batches: PDFs are parsed in a process pool, the
+enrichment DAG (app/enrichment.py) runs on a thread pool, all chunks of a batch
+are embedded in one call and written to the global index in one commit, and
+authors/tags are upserted with set-based queries. Progress is recorded in a JSON state file as soon as
+a batch's publication rows are committed and again after the batch, so an
+interrupted run resumes where it stopped without creating duplicate rows.
+Rows whose content hash matches an already-processed publication, or an
+earlier row of the same batch, reuse its results instead of calling the LLM.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+from .db import SessionLocal, init_db
+from . import models
+from .embeddings import embed_texts
+from .ingestion import (
+    _pdf_to_text,
+    file_sha256,
+    text_sha256,
+    find_ingested_duplicate,
+    reuse_ingested_publication,
+    record_fingerprints,
+    apply_section_summaries,
+    bulk_upsert_authors,
+    bulk_upsert_tags,
+    publication_chunks,
+)
+from .enrichment import enrich_publication
+from .faq_index import save_faq_embeddings
+from .vectorstore import upsert_global_documents
+
+
+def _row_key(row: dict) -> str:
+    return row.get("pdf_path") or row.get("text_path") or row["title"]
+
+
+def _read_row_text(row: dict) -> tuple[str, Optional[str], Optional[str]]:
+    """(text, content sha256, error) for one manifest row; runs in the PDF process pool.
+
+    The hash matches what an upload of the same file / text would record, so
+    `find_ingested_duplicate` dedups across both paths.
+    """
+    try:
+        if row.get("text_path"):
+            with open(row["text_path"], "r", encoding="utf-8") as f:
+                text = f.read()
+            return text, text_sha256(text), None
+        if row.get("pdf_path"):
+            # Already a pool worker: extract in-process (pages still time out) instead of nesting a per-PDF pool
+            return _pdf_to_text(row["pdf_path"], parallel=False), file_sha256(row["pdf_path"]), None
+        return "", None, "no pdf_path or text_path"
+    except Exception as e:
+        return "", None, f"{type(e).__name__}: {e}"
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rows": {}}
+
+
+def _save_state(path: str, state: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_manifest(path: str) -> List[dict]:
+    base = os.path.dirname(os.path.abspath(path))
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+            if not row.get("title"):
+                continue
+            for col in ("pdf_path", "text_path"):
+                if row.get(col) and not os.path.isabs(row[col]):
+                    row[col] = os.path.join(base, row[col])
+            rows.append(row)
+    return rows
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+def _create_publications(db, rows: List[dict], hashes: List[Optional[str]], state: dict, state_path: str) -> None:
+    """Insert publication rows not created by an earlier (interrupted) run, then persist their ids."""
+    fresh = [(r, h) for r, h in zip(rows, hashes) if state["rows"].get(_row_key(r), {}).get("publication_id") is None]
+    pubs = [
+        models.Publication(
+            title=r["title"],
+            abstract=r.get("abstract") or None,
+            date_year=r.get("date_year") or None,
+            date_month=r.get("date_month") or None,
+            organism=r.get("organism") or None,
+            environment=r.get("environment") or None,
+            original_link=r.get("original_link") or None,
+            metadata_json={},
+            category_id=_int_or_none(r.get("category_id")),
+            subcategory_id=_int_or_none(r.get("subcategory_id")),
+            others_data={},
+            content_sha256=h,
+        )
+        for r, h in fresh
+    ]
+    if not pubs:
+        return
+    db.add_all(pubs)
+    db.flush()
+    bulk_upsert_authors(db, {
+        p.id: [{"name": n.strip()} for n in (r.get("authors") or "").split(";")]
+        for (r, _), p in zip(fresh, pubs)
+    })
+    db.commit()
+    for (r, _), p in zip(fresh, pubs):
+        state["rows"][_row_key(r)] = {"publication_id": p.id, "done": False}
+    # Persist the new ids before the slow enrichment step, so a resume never re-creates these rows
+    _save_state(state_path, state)
+
+
+def _ingest_batch(rows: List[dict], texts: List[tuple], state: dict, state_path: str, llm_workers: int) -> int:
+    db = SessionLocal()
+    try:
+        _create_publications(db, rows, [h for _, h, _ in texts], state, state_path)
+        items = []
+        reused = 0
+        leaders = {}  # sha -> the batch's first publication with that content
+        followers = []  # (pub, leader, entry): same content as an earlier row of this batch
+        for r, (text, sha, error) in zip(rows, texts):
+            entry = state["rows"][_row_key(r)]
+            if error or not text.strip():
+                entry["error"] = error or "no text extracted"
+                continue
+            pub = db.get(models.Publication, entry["publication_id"])
+            src = find_ingested_duplicate(db, sha, exclude_id=pub.id) if sha else None
+            if src is not None:
+                reuse_ingested_publication(db, src, pub)
+                entry["done"] = True
+                entry.pop("error", None)
+                reused += 1
+                continue
+            if sha in leaders:
+                followers.append((pub, leaders[sha], entry))
+                continue
+            if sha:
+                leaders[sha] = pub
+            items.append((pub, text, entry))
+
+        def _summarize(item):
+            pub, text, entry = item
+            try:
+                return enrich_publication(pub.title, text, pub.abstract)
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, llm_workers)) as pool:
+            sections = list(pool.map(_summarize, items))
+        ok = [(item, s) for item, s in zip(items, sections) if s is not None]
+
+        for (pub, text, _), s in ok:
+            apply_section_summaries(pub, s)
+            pub.full_text = text
+            record_fingerprints(pub, text, ["summaries"])
+        bulk_upsert_tags(db, {pub.id: s.tags for (pub, _, _), s in ok})
+        db.commit()
+
+        docs = [d for (pub, text, _), _ in ok for d in publication_chunks(pub, text)]
+        if docs:
+            upsert_global_documents(docs, embed_texts([d.page_content for d in docs]))
+        for (pub, text, _), _ in ok:
+            save_faq_embeddings(pub.id, pub.faqs)
+            record_fingerprints(pub, text, ["chunks", "vectors"])
+        db.commit()
+        for (_, _, entry), _ in ok:
+            entry["done"] = True
+            entry.pop("error", None)
+
+        # Leaders are indexed now, so their duplicates copy them instead of being enriched and embedded again
+        done = {pub.id for (pub, _, _), _ in ok}
+        for pub, src, entry in followers:
+            if src.id not in done:
+                entry["error"] = f"duplicate of publication {src.id}, which failed"
+                continue
+            reuse_ingested_publication(db, src, pub)
+            entry["done"] = True
+            entry.pop("error", None)
+            reused += 1
+        return len(ok) + reused
+    finally:
+        db.close()
+
+
+def bulk_ingest(manifest_path: str, state_path: str, batch_size: int = 25, pdf_workers: int = 4, llm_workers: int = 4) -> None:
+    init_db()
+    rows = _read_manifest(manifest_path)
+    state = _load_state(state_path)
+    pending = [r for r in rows if not state["rows"].get(_row_key(r), {}).get("done")]
+    print(f"{len(rows)} papers in manifest, {len(rows) - len(pending)} already ingested, {len(pending)} to go.")
+
+    started = time.perf_counter()
+    ingested = 0
+    with ProcessPoolExecutor(max_workers=max(1, pdf_workers)) as pdf_pool:
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            t0 = time.perf_counter()
+            texts = list(pdf_pool.map(_read_row_text, batch))
+            n = _ingest_batch(batch, texts, state, state_path, llm_workers)
+            _save_state(state_path, state)
+            ingested += n
+            elapsed = time.perf_counter() - started
+            print(
+                f"batch {i // batch_size + 1}: {n}/{len(batch)} papers in {time.perf_counter() - t0:.1f}s | "
+                f"total {ingested} papers, {ingested / elapsed * 60:.1f} papers/min"
+            )
+
+    failed = {k: v["error"] for k, v in state["rows"].items() if v.get("error")}
+    elapsed = time.perf_counter() - started
+    print(f"Done: {ingested} papers in {elapsed:.1f}s ({ingested / elapsed * 60 if elapsed else 0:.1f} papers/min), {len(failed)} failed.")
+    for key, err in failed.items():
+        print(f"  failed: {key}: {err}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk-ingest publications listed in a CSV manifest.")
+    ap.add_argument("manifest")
+    ap.add_argument("--state", help="resume state file (default: <manifest>.state.json)")
+    ap.add_argument("--batch-size", type=int, default=25)
+    ap.add_argument("--pdf-workers", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--llm-workers", type=int, default=4)
+    args = ap.parse_args()
+    bulk_ingest(
+        args.manifest,
+        args.state or args.manifest + ".state.json",
+        batch_size=args.batch_size,
+        pdf_workers=args.pdf_workers,
+        llm_workers=args.llm_workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from functools import lru_cache
+from typing import Iterable, Iterator, List
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
+
+# -------- Chunking --------
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+
+def _splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+
+def chunk_pages(pages: Iterable[str]) -> Iterator[Document]:
+    """Chunk a stream of page texts, emitting chunks before the last page arrives.
+
+    Pages are joined with newlines (as in `_pdf_to_text`). Chunks far enough from
+    the tail of the buffer are emitted; the tail is kept and re-split with the
+    next page. Each chunk carries `start_index`, its offset in the joined text.
+    """
+    splitter = _splitter()
+    buf, buf_start, first = "", 0, True
+    for page in pages:
+        buf += ("" if first else "\n") + page
+        first = False
+        if len(buf) < 4 * CHUNK_SIZE:
+            continue
+        docs = splitter.create_documents([buf])
+        keep_from = None
+        for d in docs:
+            start = d.metadata["start_index"]
+            if start + len(d.page_content) > len(buf) - CHUNK_SIZE:
+                keep_from = start
+                break
+            d.metadata["start_index"] = buf_start + start
+            yield d
+        if keep_from is None:
+            buf_start, buf = buf_start + len(buf), ""
+        elif keep_from:
+            buf_start, buf = buf_start + keep_from, buf[keep_from:]
+    if buf.strip():
+        for d in splitter.create_documents([buf]):
+            d.metadata["start_index"] = buf_start + d.metadata["start_index"]
+            yield d
+
+def chunk_text(text: str) -> List[Document]:
+    return list(chunk_pages([text]))
+
+# -------- Token budgets --------
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken missing or its BPE file can't be fetched: fall back to an estimate
+        return None
+
+def token_len(text: str) -> int:
+    """Token count of `text` (cl100k_base; ~4 chars/token when tiktoken is unavailable)."""
+    enc = _encoding()
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """Prefix of `text` that fits in `budget` tokens."""
+    enc = _encoding()
+    if enc is None:
+        return text[:max(0, budget) * 4]
+    ids = enc.encode(text, disallowed_special=())
+    return text if len(ids) <= budget else enc.decode(ids[:max(0, budget)])
+
+def pack_texts(texts: List[str], budget: int) -> List[List[str]]:
+    """Greedily group consecutive texts so each group stays within `budget` tokens."""
+    groups: List[List[str]] = []
+    cur: List[str] = []
+    used = 0
+    for t in texts:
+        n = token_len(t)
+        if cur and used + n > budget:
+            groups.append(cur)
+            cur, used = [], 0
+        cur.append(t)
+        used += n
+    if cur:
+        groups.append(cur)
+    return groups
+
+def pack_chunks(text: str, budget: int) -> List[str]:
+    """Split `text` into contiguous parts of at most ~`budget` tokens along `chunk_text` boundaries.
+
+    Parts are sliced from the original text by `start_index`, so chunk
+    overlaps aren't repeated inside a part.
+    """
+    if token_len(text) <= budget:
+        return [text] if text.strip() else []
+    parts: List[str] = []
+    first = last = None
+    used = 0
+    for d in chunk_text(text):
+        n = token_len(d.page_content)
+        if first is not None and used + n > budget:
+            parts.append(text[first.metadata["start_index"]:last.metadata["start_index"] + len(last.page_content)])
+            first, used = None, 0
+        if first is None:
+            first = d
+        last = d
+        used += n
+    if first is not None:
+        parts.append(text[first.metadata["start_index"]:last.metadata["start_index"] + len(last.page_content)])
+    return parts
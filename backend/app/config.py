@@ -21,6 +21,11 @@ class Settings:
 
         self.LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "ollama")      # openai | ollama | groq | gemini
         self.LLM_MODEL: str = os.getenv("LLM_MODEL", "mistral")
+        self.LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", 4))  # in-flight calls per provider
+        self.LLM_TIMEOUT_S: float = float(os.getenv("LLM_TIMEOUT_S", 120))
+        self.LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 3))  # on rate limits / timeouts / connection errors
+        self.LLM_RETRY_BASE_S: float = float(os.getenv("LLM_RETRY_BASE_S", 1.0))  # jittered exponential backoff base
+        self.LLM_RETRY_MAX_S: float = float(os.getenv("LLM_RETRY_MAX_S", 30.0))
 
         # Paths
         self.INDICES_DIR: str = os.path.abspath(os.path.join(os.getcwd(), "..", "data", "indices"))
@@ -28,6 +33,64 @@ class Settings:
         os.makedirs(self.INDICES_DIR, exist_ok=True)
         os.makedirs(self.UPLOADS_DIR, exist_ok=True)
 
+        # Ingestion
+        self.INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", 2))  # concurrent background ingestion jobs
+        self.PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", os.cpu_count() or 2))  # processes extracting PDF pages
+        self.PDF_PAGE_TIMEOUT_S: float = float(os.getenv("PDF_PAGE_TIMEOUT_S", 30))  # give up on a single page after this
+        self.PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 16))  # smaller PDFs are parsed in-process
+
+        # Long-document summarization (map-reduce over token-budgeted chunk groups)
+        self.SUMMARY_MODE: str = os.getenv("SUMMARY_MODE", "auto")  # auto | single | map_reduce
+        self.SUMMARY_SINGLE_MAX_TOKENS: int = int(os.getenv("SUMMARY_SINGLE_MAX_TOKENS", 8000))  # auto: one call up to this size
+        self.SUMMARY_MAP_TOKENS: int = int(os.getenv("SUMMARY_MAP_TOKENS", 3000))  # text per map call
+        self.SUMMARY_REDUCE_TOKENS: int = int(os.getenv("SUMMARY_REDUCE_TOKENS", 6000))  # notes per reduce call
+        self.SUMMARY_MAP_CONCURRENCY: int = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 8))  # parallel map calls per document
+
+        # Enrichment: independent per-section LLM calls run concurrently (dag) or one SectionSummaries call (single)
+        self.ENRICH_MODE: str = os.getenv("ENRICH_MODE", "dag")  # dag | single
+        self.ENRICH_SECTION_RETRIES: int = int(os.getenv("ENRICH_SECTION_RETRIES", 1))  # re-runs of a section whose output won't parse
+
+        # Corpus-wide QA: bounded candidate pool and context keep retrieval + prompt assembly latency flat
+        self.CORPUS_FETCH_K: int = int(os.getenv("CORPUS_FETCH_K", 64))  # max FAISS candidates per query
+        self.CORPUS_OVERFETCH: int = int(os.getenv("CORPUS_OVERFETCH", 4))  # candidates fetched per requested chunk
+        self.CORPUS_MAX_K: int = int(os.getenv("CORPUS_MAX_K", 16))  # chunks sent to the LLM at most
+        self.CORPUS_CONTEXT_TOKENS: int = int(os.getenv("CORPUS_CONTEXT_TOKENS", 4000))  # prompt context budget
+
+        # Vector index caching
+        self.GLOBAL_MAX_DELTA_SEGMENTS: int = int(os.getenv("GLOBAL_MAX_DELTA_SEGMENTS", 8))  # merge this many similar-sized deltas into one
+        self.GLOBAL_COMPACT_BASE_RATIO: float = float(os.getenv("GLOBAL_COMPACT_BASE_RATIO", 0.25))  # fold deltas into the base once they reach this fraction of it
+        self.GLOBAL_SEGMENT_GRACE_S: float = float(os.getenv("GLOBAL_SEGMENT_GRACE_S", 600))  # keep merged-away segments on disk this long for other processes
+        self.GLOBAL_GROUP_COMMIT_MS: int = int(os.getenv("GLOBAL_GROUP_COMMIT_MS", 50))  # writer waits this long to batch concurrent ingests
+        self.PUB_INDEX_CACHE_SIZE: int = int(os.getenv("PUB_INDEX_CACHE_SIZE", 64))  # per-publication indices kept in memory
+
+        # Embedding cache (SQLite, keyed by provider + model + sha256(text))
+        self.EMBED_CACHE_ENABLED: bool = os.getenv("EMBED_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+        self.EMBED_CACHE_PATH: str = os.getenv("EMBED_CACHE_PATH", os.path.join(os.path.dirname(self.INDICES_DIR), "embed_cache.sqlite3"))
+        self.EMBED_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 500000))
+
+        # LLM response cache for structured-output chains (SQLite, keyed by provider + model + prompt hash)
+        self.LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+        self.LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(self.INDICES_DIR), "llm_cache.sqlite3"))
+        self.LLM_CACHE_TTL_S: float = float(os.getenv("LLM_CACHE_TTL_S", 30 * 24 * 3600))
+        self.LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+
+        # Semantic answer cache for single-document QA (in-process, per publication)
+        self.ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+        self.ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))  # min cosine similarity of questions
+        self.ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+        self.ANSWER_CACHE_TTL_S: float = float(os.getenv("ANSWER_CACHE_TTL_S", 24 * 3600))
+
+        # Single-document QA prompt context (merged passages, tiktoken-measured)
+        self.QA_CONTEXT_TOKENS: int = int(os.getenv("QA_CONTEXT_TOKENS", 2500))
+
+        # Batch single-document QA (/qa/single-doc/batch)
+        self.QA_BATCH_MAX_QUESTIONS: int = int(os.getenv("QA_BATCH_MAX_QUESTIONS", 100))
+        self.QA_BATCH_CONCURRENCY: int = int(os.getenv("QA_BATCH_CONCURRENCY", 8))  # answers generated at once per batch
+
+        # FAQ short-circuit for single-document QA (FAQ questions embedded at ingest)
+        self.FAQ_MATCH_ENABLED: bool = os.getenv("FAQ_MATCH_ENABLED", "true").lower() in ("true", "1", "yes")
+        self.FAQ_MATCH_THRESHOLD: float = float(os.getenv("FAQ_MATCH_THRESHOLD", 0.9))  # min cosine similarity to a stored FAQ question
+
         # LangSmith
         self.LANGCHAIN_TRACING_V2: bool = os.getenv("LANGCHAIN_TRACING_V2", "false").lower() in ("true", "1", "yes")
         self.LANGCHAIN_PROJECT: str | None = os.getenv("LANGCHAIN_PROJECT")
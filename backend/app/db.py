@@ -41,4 +41,43 @@ def init_db():
     from .seed import seed_data
     # Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    _ensure_columns()
+    _ensure_indexes()
     # seed_data()
+
+# Columns added to tables that existing databases already have; create_all never alters a table
+_ADDED_COLUMNS = {
+    "publications": ("content_sha256", "full_text", "ingest_fingerprints"),
+}
+
+def _ensure_columns():
+    """ALTER TABLE ... ADD COLUMN for every column in _ADDED_COLUMNS the database is missing."""
+    from sqlalchemy import inspect, text
+    inspector = inspect(engine)
+    if_not_exists = " IF NOT EXISTS" if engine.dialect.name == "postgresql" else ""
+    for table_name, names in _ADDED_COLUMNS.items():
+        existing = {c["name"] for c in inspector.get_columns(table_name)}
+        table = Base.metadata.tables[table_name]
+        for name in names:
+            if name in existing:
+                continue
+            col_type = table.c[name].type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN{if_not_exists} {name} {col_type}"))
+                print(f"Added column {table_name}.{name}")
+            except Exception as e:
+                # e.g. another process added it first
+                print(f"Could not add column {table_name}.{name}: {e}")
+
+def _ensure_indexes():
+    """create_all skips indexes on tables that already exist; add the ones lookups and upserts rely on."""
+    from sqlalchemy.schema import CreateIndex
+    from .models import Author, Publication
+    for index in [*Publication.__table__.indexes, *Author.__table__.indexes]:
+        try:
+            with engine.begin() as conn:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        except Exception as e:
+            # e.g. duplicate (name, orcid) rows left by older versions; dedupe them, then restart
+            print(f"Could not create index {index.name}: {e}")
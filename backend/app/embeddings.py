@@ -20,16 +20,215 @@
 #     else:
 #         raise ValueError(f"Unsupported EMBED_PROVIDER: {settings.EMBED_PROVIDER}")
 
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_ollama import OllamaEmbeddings
 from app.config import get_settings
 
 _settings = get_settings()
 
-def get_embeddings():
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings client with a persistent, content-addressed SQLite cache.
+
+    Rows are keyed by (provider, model, sha256(text)) and hold float32 blobs, so
+    changing EMBED_PROVIDER or EMBED_MODEL simply stops matching old rows. The
+    least recently used rows are evicted once the table grows past `max_entries`.
+    Hits only read: their `last_used` touches are buffered and written with the
+    next store (or every `_TOUCH_BATCH` hits), and the row count is kept in
+    memory rather than counted on every store.
+    """
+
+    _BATCH = 500  # stays under SQLite's bound-parameter limit
+    _TOUCH_BATCH = 1000  # buffered last_used updates flushed at once
+    _EVICT_TO = 0.9  # evict down to this fraction of max_entries, so eviction (and a recount) is rare
+
+    def __init__(self, inner: Embeddings, provider: str, model: str, path: str, max_entries: int):
+        self.inner = inner
+        self.provider = provider
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # text_hash -> last hit time, not yet written
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " provider TEXT NOT NULL, model TEXT NOT NULL, text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (provider, model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(hashes), self._BATCH):
+                batch = hashes[i:i + self._BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE provider = ? AND model = ? AND text_hash IN ({marks})",
+                    [self.provider, self.model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype="float32").tolist()
+                    self._touched[h] = now
+            if len(self._touched) >= self._TOUCH_BATCH:
+                self._flush_touches()
+                self._conn.commit()
+        return found
+
+    def _flush_touches(self) -> None:
+        """Write buffered last_used updates; caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE provider = ? AND model = ? AND text_hash = ?",
+                [(t, self.provider, self.model, h) for h, t in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._flush_touches()
+            cur = self._conn.executemany(
+                "INSERT INTO embeddings (provider, model, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (provider, model, text_hash) DO NOTHING",
+                [(self.provider, self.model, h, np.asarray(v, dtype="float32").tobytes(), now) for h, v in items.items()],
+            )
+            self._rows += max(0, cur.rowcount)  # rows actually inserted
+            if self.max_entries and self._rows > self.max_entries:
+                # Other processes may share the file, so recount before evicting
+                (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                excess = self._rows - int(self.max_entries * self._EVICT_TO)
+                if self._rows > self.max_entries and excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    self._rows -= excess
+            self._conn.commit()
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _partition(self, texts: List[str]):
+        """Look up `texts`; returns (hashes, cached vectors by hash, uncached text by hash)."""
+        hashes = [self._hash(t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(hashes)))
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, t)
+        n_missing = sum(1 for h in hashes if h in missing)
+        self._count(len(texts) - n_missing, n_missing)
+        return hashes, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = self._partition(texts)
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = self._hash(text)
+        found = self._lookup([h])
+        if h in found:
+            self._count(1, 0)
+            return found[h]
+        self._count(0, 1)
+        vector = self.inner.embed_query(text)
+        self._store({h: vector})
+        return vector
+
+    # SQLite reads and writes go to a worker thread so they never stall the event loop
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = await asyncio.to_thread(self._partition, texts)
+        if missing:
+            vectors = await self.inner.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+        return [found[h] for h in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        h = self._hash(text)
+        found = await asyncio.to_thread(self._lookup, [h])
+        if h in found:
+            self._count(1, 0)
+            return found[h]
+        self._count(0, 1)
+        vector = await self.inner.aembed_query(text)
+        await asyncio.to_thread(self._store, {h: vector})
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE provider = ? AND model = ?", (self.provider, self.model)
+            ).fetchone()
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / total) if total else 0.0,
+        }
+
+def _base_embeddings():
     if _settings.EMBED_PROVIDER == "openai":
         return OpenAIEmbeddings(model=_settings.EMBED_MODEL, api_key=_settings.OPENAI_API_KEY)
     elif _settings.EMBED_PROVIDER == "ollama":
         return OllamaEmbeddings(model=_settings.EMBED_MODEL)
     else:
         raise ValueError("Unsupported EMBED_PROVIDER")
+
+@lru_cache
+def get_embeddings():
+    base = _base_embeddings()
+    if not _settings.EMBED_CACHE_ENABLED:
+        return base
+    return CachedEmbeddings(
+        base,
+        provider=_settings.EMBED_PROVIDER,
+        model=_settings.EMBED_MODEL,
+        path=_settings.EMBED_CACHE_PATH,
+        max_entries=_settings.EMBED_CACHE_MAX_ENTRIES,
+    )
+
+def embedding_cache_stats() -> dict | None:
+    emb = get_embeddings()
+    return emb.stats() if isinstance(emb, CachedEmbeddings) else None
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed `texts` in one provider call and return a (len(texts), dim) float32 matrix."""
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    return np.asarray(get_embeddings().embed_documents(list(texts)), dtype="float32")
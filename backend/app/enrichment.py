@@ -0,0 +1,206 @@
+"""Publication enrichment as a DAG of small LLM tasks.
+
+Instead of one giant SectionSummaries JSON call, each section is its own
+structured call (own prompt, own cache entry, own retries), and independent
+sections run concurrently on a shared asyncio loop:
+
+    [notes (map over parts, long papers only)]
+        -> knowledge_graph | summaries | progress | gaps | consensus | faqs | tags
+        -> SectionSummaries
+
+Latency approaches the slowest single section instead of the sum, and schema
+drift in one section only re-runs that section.
+"""
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.output_parsers import PydanticOutputParser
+from pydantic import BaseModel, Field, create_model
+from .config import get_settings
+from .chunking import pack_chunks
+from .llm_cache import ainvoke_structured
+from .knowledge_graph import aextract_knowledge_graph
+from . import rag_graph as R
+from .rag_graph import SectionSummaries, ScientificProgress, KnowledgeGaps, Consensus, FAQ, _llm
+
+settings = get_settings()
+
+
+# -------- Section schemas --------
+AudienceSummaries = create_model(
+    "AudienceSummaries",
+    **{
+        name: (SectionSummaries.model_fields[name].annotation, SectionSummaries.model_fields[name])
+        for name in ("abstract_summary", "scientist_summary", "investor_summary", "mission_architect_summary")
+    },
+)
+
+class FAQList(BaseModel):
+    faqs: List[FAQ] = Field(..., description="3-5 frequently asked questions and answers")
+
+class TagList(BaseModel):
+    tags: List[str] = Field(..., description="Tags or keywords that summarize the paper and connect related papers")
+
+# name -> (schema, instruction, required)
+SECTION_TASKS = {
+    "summaries": (
+        AudienceSummaries,
+        "Write a concise summary of the abstract (not the full abstract), and summaries for scientists, "
+        "investors and mission architects (max 70 words each).",
+        True,
+    ),
+    "progress": (ScientificProgress, "Describe the scientific progress: recent advances, key breakthroughs, impact on the field.", False),
+    "gaps": (KnowledgeGaps, "Identify knowledge gaps: current limitations, research needs, future directions.", False),
+    "consensus": (Consensus, "Describe scientific consensus, areas of debate and community perspectives.", False),
+    "faqs": (FAQList, "Generate 3-5 common questions a reader might have, with answers.", True),
+    "tags": (TagList, "Give a list of tags or keywords that summarize the paper.", True),
+}
+
+_SECTION_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a precise assistant for scientific summarization. Base your answer only on the provided paper content. "
+            "Return ONLY valid JSON that conforms exactly to the schema and format instructions.",
+        ),
+        (
+            "user",
+            "Title: {title}\n\nAbstract: {abstract}\n\n{content_label}:\n{content}\n\n"
+            "Task: {instruction}\n\nFORMAT INSTRUCTIONS:\n{format_instructions}",
+        ),
+    ]
+)
+
+
+# -------- DAG nodes --------
+async def _with_retries(name: str, title: str, call: Callable[[bool], Awaitable], bypass_cache: bool):
+    """Run one section's `call(bypass)` with ENRICH_SECTION_RETRIES retries; retries skip the LLM cache."""
+    for attempt in range(settings.ENRICH_SECTION_RETRIES + 1):
+        try:
+            # Transport errors are already retried by the client; this retries unparseable output
+            return await call(bypass_cache or attempt > 0)
+        except Exception as e:
+            if attempt >= settings.ENRICH_SECTION_RETRIES:
+                raise
+            print(f"Section '{name}' failed for '{title}' ({type(e).__name__}: {e}); retrying")
+
+async def _run_section(name: str, title: str, abstract: str, content_label: str, content: str, bypass_cache: bool) -> BaseModel:
+    schema, instruction, _ = SECTION_TASKS[name]
+    parser = PydanticOutputParser(pydantic_object=schema)
+    messages = _SECTION_PROMPT.format_messages(
+        title=title, abstract=abstract, content_label=content_label, content=content,
+        instruction=instruction, format_instructions=parser.get_format_instructions(),
+    )
+    return await _with_retries(name, title, lambda bypass: ainvoke_structured(_llm, messages, parser, bypass=bypass), bypass_cache)
+
+async def _map_notes(title: str, full_text: str, bypass_cache: bool) -> tuple[List[str], dict]:
+    """Map step for long papers: (notes, merged knowledge graph) from concurrent per-part calls."""
+    parts = pack_chunks(full_text, settings.SUMMARY_MAP_TOKENS)
+    sem = asyncio.Semaphore(max(1, settings.SUMMARY_MAP_CONCURRENCY))
+
+    async def _one(part: str) -> Optional[R.ChunkNotes]:
+        async with sem:
+            try:
+                return await ainvoke_structured(_llm, *R.map_request(title, part), bypass=bypass_cache)
+            except Exception as e:
+                print(f"Map step failed for a part of '{title}': {e}")
+                return None
+
+    mapped = [m for m in await asyncio.gather(*[_one(p) for p in parts]) if m is not None]
+    if not mapped:
+        raise ValueError(f"Map step failed for every part of '{title}'")
+    graph = R.merge_knowledge_graphs(m.knowledge_graph.model_dump() for m in mapped)
+    notes = [n for m in mapped for n in m.notes]
+    # Collapsing is rare (only when notes overflow the reduce budget)
+    notes = await asyncio.to_thread(R.collapse_notes, title, notes, bypass_cache)
+    return notes, graph
+
+async def agenerate_section_summaries(
+    title: str,
+    full_text: str,
+    abstract: Optional[str],
+    bypass_cache: bool = False,
+    progress: Callable[[str], None] = lambda stage: None,
+) -> SectionSummaries:
+    """Run the enrichment DAG and assemble a SectionSummaries."""
+    abstract = abstract or ""
+    t0 = time.perf_counter()
+    if R.use_map_reduce(full_text):
+        progress("summarizing:notes")
+        notes, graph = await _map_notes(title, full_text, bypass_cache)
+        content_label, content = "Notes from the full paper", "\n".join(f"- {n}" for n in notes)
+
+        async def _graph():
+            return graph
+        kg_task = _graph()
+    else:
+        content_label, content = "Paper Content (truncated if long)", full_text[:120000]
+        kg_task = _with_retries(
+            "knowledge_graph", title, lambda bypass: aextract_knowledge_graph(full_text, bypass_cache=bypass), bypass_cache
+        )
+
+    async def _timed(name: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            print(f"  section {name}: {time.perf_counter() - start:.1f}s")
+
+    progress("summarizing:sections")
+    names = ["knowledge_graph", *SECTION_TASKS]
+    results = await asyncio.gather(
+        _timed("knowledge_graph", kg_task),
+        *[_timed(n, _run_section(n, title, abstract, content_label, content, bypass_cache)) for n in SECTION_TASKS],
+        return_exceptions=True,
+    )
+    out = dict(zip(names, results))
+    for name, result in out.items():
+        if isinstance(result, BaseException):
+            if name == "knowledge_graph" or SECTION_TASKS[name][2]:
+                raise result
+            print(f"Optional section '{name}' failed for '{title}': {result}")
+            out[name] = None
+    print(f"Enrichment DAG for '{title}' took {time.perf_counter() - t0:.1f}s")
+
+    graph = out["knowledge_graph"]
+    return SectionSummaries(
+        **out["summaries"].model_dump(),
+        knowledge_graph=graph if isinstance(graph, dict) else graph.model_dump(),
+        scientific_progress=out["progress"],
+        knowledge_gaps=out["gaps"],
+        consensus=out["consensus"],
+        faqs=out["faqs"].faqs,
+        tags=out["tags"].tags,
+    )
+
+
+# -------- Sync entry point --------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def _enrich_loop() -> asyncio.AbstractEventLoop:
+    """One long-lived loop for ingestion, so pooled async LLM clients are reused across papers."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="enrich-loop", daemon=True).start()
+        return _loop
+
+def enrich_publication(
+    title: str,
+    full_text: str,
+    abstract: Optional[str],
+    bypass_cache: bool = False,
+    progress: Callable[[str], None] = lambda stage: None,
+) -> SectionSummaries:
+    """Generate all AI sections for a paper; call from worker threads (ingest jobs, bulk ingest, re-ingest).
+
+    ENRICH_MODE=single falls back to the one-call `generate_section_summaries`.
+    """
+    if settings.ENRICH_MODE == "single":
+        return R.generate_section_summaries(title, full_text, abstract, bypass_cache=bypass_cache)
+    coro = agenerate_section_summaries(title, full_text, abstract, bypass_cache=bypass_cache, progress=progress)
+    return asyncio.run_coroutine_threadsafe(coro, _enrich_loop()).result()
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from .config import get_settings
+from .embeddings import embed_texts
+
+settings = get_settings()
+
+# Per-publication FAQ matrix under INDICES_DIR/faq:
+#   <pub_id>.npy   (n_faqs, dim) float32, unit-normalized question embeddings
+#   <pub_id>.json  {"embed_provider", "embed_model", "questions": [...], "answers": [...]}
+# Written at ingest; QA matches incoming questions against it before retrieval.
+
+
+def _faq_dir() -> str:
+    d = os.path.join(settings.INDICES_DIR, "faq")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+def _clean_faqs(faqs) -> List[Tuple[str, str]]:
+    out = []
+    for f in faqs or []:
+        q, a = (f.get("question"), f.get("answer")) if isinstance(f, dict) else (getattr(f, "question", None), getattr(f, "answer", None))
+        if q and a and q.strip() and a.strip():
+            out.append((q.strip(), a.strip()))
+    return out
+
+
+def save_faq_embeddings(pub_id: int, faqs) -> int:
+    """Embed the FAQ questions of one publication and store them; returns the number stored."""
+    pairs = _clean_faqs(faqs)
+    base = os.path.join(_faq_dir(), str(pub_id))
+    if not pairs:
+        for ext in (".json", ".npy"):
+            if os.path.exists(base + ext):
+                os.remove(base + ext)
+        _faq_cache.invalidate(pub_id)
+        return 0
+    vectors = _normalize(embed_texts([q for q, _ in pairs]))
+    meta = {
+        "embed_provider": settings.EMBED_PROVIDER,
+        "embed_model": settings.EMBED_MODEL,
+        "questions": [q for q, _ in pairs],
+        "answers": [a for _, a in pairs],
+    }
+    # Matrix first, sidecar last: readers key off the sidecar's mtime
+    with open(base + ".npy.tmp", "wb") as f:
+        np.save(f, vectors.astype("float32"))
+    os.replace(base + ".npy.tmp", base + ".npy")
+    with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(base + ".json.tmp", base + ".json")
+    _faq_cache.invalidate(pub_id)
+    return len(pairs)
+
+
+class _FaqCache:
+    """Small LRU of loaded FAQ matrices, reloaded when the files change on disk."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def get(self, pub_id: int) -> Optional[Tuple[np.ndarray, dict]]:
+        base = os.path.join(_faq_dir(), str(pub_id))
+        try:
+            mtime = os.stat(base + ".json").st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            hit = self._entries.get(pub_id)
+            if hit is not None and hit[0] == mtime:
+                self._entries.move_to_end(pub_id)
+                return hit[1], hit[2]
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(base + ".npy")
+        with self._lock:
+            self._entries[pub_id] = (mtime, vectors, meta)
+            self._entries.move_to_end(pub_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vectors, meta
+
+    def invalidate(self, pub_id: int) -> None:
+        with self._lock:
+            self._entries.pop(pub_id, None)
+
+
+_faq_cache = _FaqCache()
+
+
+def match_faq(pub_id: int, question_vec: np.ndarray) -> Optional[dict]:
+    """Stored FAQ answer whose question is within FAQ_MATCH_THRESHOLD (cosine) of `question_vec` (unit-normalized)."""
+    loaded = _faq_cache.get(pub_id)
+    if loaded is None:
+        return None
+    vectors, meta = loaded
+    if (meta.get("embed_provider"), meta.get("embed_model")) != (settings.EMBED_PROVIDER, settings.EMBED_MODEL):
+        return None  # embedded with another model; re-ingest refreshes it
+    if vectors.shape[1] != question_vec.shape[0]:
+        return None
+    sims = vectors @ question_vec
+    best = int(np.argmax(sims))
+    if sims[best] < settings.FAQ_MATCH_THRESHOLD:
+        return None
+    return {"question": meta["questions"][best], "answer": meta["answers"][best], "similarity": float(sims[best])}
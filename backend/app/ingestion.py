@@ -1,27 +1,45 @@
-import os, io
-from typing import List
+import os
+import atexit
+import hashlib
+import json
+import logging
+import multiprocessing
+import signal
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, List
 from pypdf import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from .models import Publication, Author, PublicationAuthor, Tag, PublicationTag
-from .vectorstore import save_faiss_for_publication, upsert_global_documents
+from .vectorstore import upsert_global_documents, publication_chunks_with_vectors, has_publication_index
+from .embeddings import embed_texts
+from .answer_cache import invalidate_answers
+from .faq_index import save_faq_embeddings
 from .config import get_settings
-from .rag_graph import generate_section_summaries, _llm
-from .knowledge_graph import extract_knowledge_graph
-from pydantic import BaseModel, Field
-from typing import List
+from .chunking import CHUNK_SIZE, CHUNK_OVERLAP, chunk_pages, chunk_text, pack_chunks
+from .rag_graph import _llm, SUMMARY_PROMPT_VERSION
+from .enrichment import enrich_publication
+from .llm_cache import invoke_structured
+from .llm_clients import map_concurrently
+from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from fastapi.encoders import jsonable_encoder
 class InsightsList(BaseModel):
     insights: List[str]
 
-def extract_actionable_insights(text: str) -> List[str]:
+def extract_actionable_insights(text: str, bypass_cache: bool = False) -> List[str]:
     """
     Extracts actionable insights from a given text using an LLM.
     """
-    llm = _llm()
     parser = PydanticOutputParser(pydantic_object=InsightsList)
 
     prompt = ChatPromptTemplate.from_messages(
@@ -39,65 +57,357 @@ def extract_actionable_insights(text: str) -> List[str]:
         ]
     ).partial(format_instructions=parser.get_format_instructions())
 
-    chain = prompt | llm | parser
-
     try:
-        # Limit the text size to avoid exceeding token limits
-        truncated_text = text[:12000]
-        extracted = chain.invoke({"text": truncated_text})
-        return extracted.insights
+        if settings.SUMMARY_MODE == "single":
+            # Limit the text size to avoid exceeding token limits
+            return invoke_structured(_llm, prompt.format_messages(text=text[:12000]), parser, bypass=bypass_cache).insights
+
+        # Long texts: extract per token-budgeted part concurrently, keep the first occurrence of each insight
+        def _extract(part: str) -> List[str]:
+            return invoke_structured(_llm, prompt.format_messages(text=part), parser, bypass=bypass_cache).insights
+
+        parts = pack_chunks(text, settings.SUMMARY_MAP_TOKENS)
+        insights, seen = [], set()
+        for found in map_concurrently(_extract, parts, settings.SUMMARY_MAP_CONCURRENCY):
+            for insight in found:
+                key = " ".join(insight.split()).casefold()
+                if key and key not in seen:
+                    seen.add(key)
+                    insights.append(insight)
+        return insights
     except Exception as e:
         print(f"Error extracting actionable insights: {e}")
         return []
 
-from concurrent.futures import ThreadPoolExecutor
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-def _pdf_to_text(path: str) -> str:
+# -------- PDF text extraction --------
+_worker_readers: "OrderedDict[str, PdfReader]" = OrderedDict()
+_WORKER_READERS_MAX = 4  # the pool is shared, so a worker may interleave pages of a few PDFs
+
+def _extract_page(path: str, page_no: int) -> str:
+    """Extract one page; runs in a PDF worker process that keeps its recent readers open."""
+    reader = _worker_readers.get(path)
+    if reader is None:
+        reader = _worker_readers[path] = PdfReader(path)
+        while len(_worker_readers) > _WORKER_READERS_MAX:
+            _worker_readers.popitem(last=False)
+    else:
+        _worker_readers.move_to_end(path)
+    try:
+        return reader.pages[page_no].extract_text() or ""
+    except Exception:
+        return ""
+
+# One long-lived extraction pool per process, shared by concurrent ingests and
+# replaced only when a page hangs or crashes its worker. Workers come from a
+# forkserver (spawn where there is none, e.g. Windows) so they never inherit
+# locks held by the writer, event-loop or ingest threads of the API server.
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+def _pdf_mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.PDF_WORKERS),
+                mp_context=_pdf_mp_context(),
+            )
+        return _pdf_pool
+
+def _replace_pdf_pool(stale: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """Swap out and kill `stale` if it is still the shared pool; returns the current pool.
+
+    Ingests that merely lost futures to a pool another ingest already replaced
+    just get the new pool back and resubmit.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        replaced = _pdf_pool is stale
+        if replaced:
+            _pdf_pool = None
+    if replaced:
+        _kill_pdf_pool(stale)
+    return _get_pdf_pool()
+
+def _kill_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Shut a pool down without waiting, terminating any worker stuck on a pathological page."""
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in procs:
+        proc.join(timeout=5)
+
+def _extract_page_alone(path: str, page_no: int) -> str:
+    """Extract one page in a private single-worker pool; "" if it hangs or crashes there too."""
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=_pdf_mp_context())
+    try:
+        return pool.submit(_extract_page, path, page_no).result(timeout=settings.PDF_PAGE_TIMEOUT_S)
+    except FutureTimeout:
+        print(f"PDF page {page_no + 1} timed out after {settings.PDF_PAGE_TIMEOUT_S}s in {path}; skipping it.")
+    except (CancelledError, BrokenProcessPool):
+        print(f"PDF page {page_no + 1} crashed its worker in {path}; skipping it.")
+    finally:
+        _kill_pdf_pool(pool)
+    return ""
+
+class _PageTimeout(Exception):
+    pass
+
+@contextmanager
+def _in_process_page_timeout():
+    """Bound an in-process page extraction by PDF_PAGE_TIMEOUT_S.
+
+    pypdf is pure Python, so a SIGALRM handler can interrupt a pathological
+    page. Signals only reach the main thread on POSIX, which is where pool
+    workers (e.g. bulk-ingest's PDF processes) run their tasks; elsewhere the
+    page is not bounded.
+    """
+    if (
+        not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+        or settings.PDF_PAGE_TIMEOUT_S <= 0
+    ):
+        yield
+        return
+
+    def _expired(signum, frame):
+        raise _PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, settings.PDF_PAGE_TIMEOUT_S)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+@atexit.register
+def _shutdown_pdf_pool() -> None:
+    with _pdf_pool_lock:
+        pool = _pdf_pool
+    if pool is not None:
+        _kill_pdf_pool(pool)
+
+def iter_pdf_pages(path: str, parallel: bool = True) -> Iterator[str]:
+    """Yield page texts in order while later pages are still being extracted.
+
+    Pages are fanned out to the process-wide extraction pool (PDF_WORKERS). A
+    page that takes longer than PDF_PAGE_TIMEOUT_S gets the pool replaced
+    (terminating the hung worker) so one bad page cannot stall the ingest.
+    Pages lost with a replaced or broken pool are resubmitted, and the page at
+    the head of the queue is retried alone in a private worker, so a page is
+    only yielded as "" if it hangs or crashes on its own. Short PDFs, and
+    callers already inside a process pool (`parallel=False`), extract
+    in-process, with the same per-page timeout where the platform allows it.
+    """
     reader = PdfReader(path)
-    parts = []
-    for page in reader.pages:
-        try:
-            parts.append(page.extract_text() or "")
-        except Exception:
-            parts.append("")
-    return "\n".join(parts).strip()
-
-def chunk_text(text: str) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=200)
-    chunks = splitter.split_text(text)
-    return [Document(page_content=c, metadata={}) for c in chunks]
+    n = len(reader.pages)
+    if not parallel or n <= settings.PDF_PARALLEL_MIN_PAGES or settings.PDF_WORKERS <= 1:
+        for page_no, page in enumerate(reader.pages):
+            try:
+                with _in_process_page_timeout():
+                    text = page.extract_text() or ""
+            except _PageTimeout:
+                print(f"PDF page {page_no + 1} timed out after {settings.PDF_PAGE_TIMEOUT_S}s in {path}; skipping it.")
+                text = ""
+            except Exception:
+                text = ""
+            yield text
+        return
 
-def upsert_authors(db: Session, publication_id: int, authors_in: list[dict]):
-    from .models import Author, PublicationAuthor
+    pool = _get_pdf_pool()
+    window = settings.PDF_WORKERS * 4  # bounded look-ahead keeps memory flat
+    todo = deque(range(n))
+    pending: deque = deque()  # (page_no, future)
+
+    try:
+        while todo or pending:
+            while todo and len(pending) < window:
+                try:
+                    pending.append((todo[0], pool.submit(_extract_page, path, todo[0])))
+                except (BrokenProcessPool, RuntimeError):  # RuntimeError: pool already shut down
+                    break
+                todo.popleft()
+            if not pending:
+                pool = _replace_pdf_pool(pool)
+                continue
+            page_no, fut = pending.popleft()
+            try:
+                while True:
+                    try:
+                        text = fut.result(timeout=settings.PDF_PAGE_TIMEOUT_S)
+                        break
+                    except FutureTimeout:
+                        if fut.running():
+                            raise
+                        # Still queued behind other ingests' pages on the shared pool; not hung
+            except (FutureTimeout, CancelledError, BrokenProcessPool):
+                # In-flight pages die with the old pool; queue them again in order
+                todo.extendleft(reversed([i for i, _ in pending]))
+                for _, f in pending:
+                    f.cancel()
+                pending.clear()
+                pool = _replace_pdf_pool(pool)  # terminates a hung worker
+                # The shared pool can't say whose page hung or crashed it, so retry this one alone
+                text = _extract_page_alone(path, page_no)
+            yield text
+    finally:
+        for _, f in pending:
+            f.cancel()
+
+def _pdf_to_text(path: str, parallel: bool = True) -> str:
+    return "\n".join(iter_pdf_pages(path, parallel=parallel)).strip()
+
+def extract_and_chunk_pdf(path: str) -> tuple[str, List[Document]]:
+    """Extract a PDF and chunk it in one streaming pass; returns (full text, chunks)."""
+    parts: List[str] = []
+    def _pages():
+        for page in iter_pdf_pages(path):
+            parts.append(page)
+            yield page
+    docs = list(chunk_pages(_pages()))
+    return "\n".join(parts).strip(), docs
+
+def _clean_authors(authors_in: list[dict]) -> list[dict]:
+    out = []
     for idx, a in enumerate(authors_in):
         name = (a.get("name") or "").strip()
-        if not name:
-            continue
-        aff = a.get("affiliation")
-        orcid = a.get("orcid")
-        author = db.query(Author).filter(Author.name == name, Author.orcid == orcid).first()
-        if not author:
-            author = Author(name=name, affiliation=aff, orcid=orcid)
-            db.add(author); db.flush()
-        link = db.query(PublicationAuthor).filter_by(publication_id=publication_id, author_id=author.id).first()
-        if not link:
-            db.add(PublicationAuthor(publication_id=publication_id, author_id=author.id, rank=a.get("rank", idx+1)))
+        if name:
+            out.append({"name": name, "affiliation": a.get("affiliation"), "orcid": a.get("orcid"), "rank": a.get("rank") or idx + 1})
+    return out
+
+def _clean_tags(tags: list[str]) -> list[str]:
+    return list(dict.fromkeys(t for t in ((t or "").strip().lower() for t in tags) if t))
+
+# Tag name -> id for tags known to be committed; ids from a transaction join it only once that commits
+_tag_ids: dict[str, int] = {}
+_tag_ids_lock = threading.Lock()
+
+@event.listens_for(Session, "after_commit")
+def _publish_tag_ids(session: Session) -> None:
+    pending = session.info.pop("pending_tag_ids", None)
+    if pending:
+        with _tag_ids_lock:
+            _tag_ids.update(pending)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_tag_ids(session: Session) -> None:
+    session.info.pop("pending_tag_ids", None)
+
+def _insert_ignore(db: Session, table):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's dialect (None if unsupported)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return None
+
+def _author_key(name: str, orcid: str | None) -> tuple[str, str]:
+    return name, orcid or ""
+
+def bulk_upsert_authors(db: Session, authors_by_pub: dict[int, list[dict]]) -> None:
+    """Upsert authors and their publication links for many publications with a few set-based queries.
+
+    Race-free under concurrent ingestion: conflicting inserts are skipped by the
+    (name, coalesce(orcid, '')) unique index and the link table's primary key.
+    """
+    cleaned = {pid: _clean_authors(a) for pid, a in authors_by_pub.items()}
+    rows = {}
+    for authors in cleaned.values():
+        for a in authors:
+            rows.setdefault(_author_key(a["name"], a["orcid"]), {"name": a["name"], "affiliation": a["affiliation"], "orcid": a["orcid"]})
+    if not rows:
+        return
+    insert = _insert_ignore(db, Author)
+    ids: dict[tuple[str, str], int] = {}
+    if insert is None:
+        existing = db.query(Author.id, Author.name, Author.orcid).filter(Author.name.in_({k[0] for k in rows}))
+        ids = {_author_key(n, o): i for i, n, o in existing}
+        new = {k: Author(**v) for k, v in rows.items() if k not in ids}
+        if new:
+            db.add_all(new.values()); db.flush()
+            ids.update({k: a.id for k, a in new.items()})
+    else:
+        inserted = db.execute(insert.returning(Author.id, Author.name, Author.orcid), list(rows.values()))
+        ids = {_author_key(n, o): i for i, n, o in inserted}
+        missing = {k[0] for k in rows if k not in ids}
+        if missing:
+            existing = db.execute(select(Author.id, Author.name, Author.orcid).where(Author.name.in_(missing)))
+            ids.update({_author_key(n, o): i for i, n, o in existing if _author_key(n, o) in rows})
+
+    links = {}
+    for pid, authors in cleaned.items():
+        for a in authors:
+            links.setdefault((pid, ids[_author_key(a["name"], a["orcid"])]), a["rank"])
+    link_rows = [{"publication_id": pid, "author_id": aid, "rank": rank} for (pid, aid), rank in links.items()]
+    link_insert = _insert_ignore(db, PublicationAuthor)
+    if link_insert is None:
+        linked = set(
+            db.query(PublicationAuthor.publication_id, PublicationAuthor.author_id)
+            .filter(PublicationAuthor.publication_id.in_(cleaned.keys()))
+        )
+        db.add_all(PublicationAuthor(**r) for r in link_rows if (r["publication_id"], r["author_id"]) not in linked)
+    else:
+        db.execute(link_insert, link_rows)
+
+def bulk_upsert_tags(db: Session, tags_by_pub: dict[int, list[str]]) -> None:
+    """Upsert tags and their publication links for many publications with a few set-based queries.
+
+    Tag ids come from a process-local cache first; unknown names are inserted
+    with ON CONFLICT DO NOTHING RETURNING, and only names that lost a race are
+    re-selected.
+    """
+    cleaned = {pid: _clean_tags(t) for pid, t in tags_by_pub.items()}
+    names = {t for tags in cleaned.values() for t in tags}
+    if not names:
+        return
+    pending = db.info.setdefault("pending_tag_ids", {})
+    with _tag_ids_lock:
+        ids = {n: _tag_ids[n] for n in names if n in _tag_ids}
+    ids.update({n: pending[n] for n in names if n in pending})
+    unknown = names - ids.keys()
+    insert = _insert_ignore(db, Tag)
+    if unknown:
+        if insert is None:
+            ids.update({n: i for i, n in db.query(Tag.id, Tag.name).filter(Tag.name.in_(unknown))})
+            new = [Tag(name=n) for n in unknown if n not in ids]
+            if new:
+                db.add_all(new); db.flush()
+                ids.update({t.name: t.id for t in new})
+        else:
+            ids.update({n: i for i, n in db.execute(insert.returning(Tag.id, Tag.name), [{"name": n} for n in unknown])})
+            missing = unknown - ids.keys()
+            if missing:
+                ids.update({n: i for i, n in db.execute(select(Tag.id, Tag.name).where(Tag.name.in_(missing)))})
+        pending.update({n: ids[n] for n in unknown})
+
+    link_rows = [{"publication_id": pid, "tag_id": ids[t]} for pid, tags in cleaned.items() for t in tags]
+    link_insert = _insert_ignore(db, PublicationTag)
+    if link_insert is None:
+        linked = set(
+            db.query(PublicationTag.publication_id, PublicationTag.tag_id)
+            .filter(PublicationTag.publication_id.in_(cleaned.keys()))
+        )
+        db.add_all(PublicationTag(**r) for r in link_rows if (r["publication_id"], r["tag_id"]) not in linked)
+    else:
+        db.execute(link_insert, link_rows)
+
+def upsert_authors(db: Session, publication_id: int, authors_in: list[dict]):
+    bulk_upsert_authors(db, {publication_id: authors_in})
 
 def upsert_tags(db: Session, publication_id: int, tags: list[str]):
-    from .models import Tag, PublicationTag
-    for t in tags:
-        tagname = (t or "").strip().lower()
-        if not tagname:
-            continue
-        tag = db.query(Tag).filter(Tag.name == tagname).first()
-        if not tag:
-            tag = Tag(name=tagname)
-            db.add(tag); db.flush()
-        link = db.query(PublicationTag).filter_by(publication_id=publication_id, tag_id=tag.id).first()
-        if not link:
-            db.add(PublicationTag(publication_id=publication_id, tag_id=tag.id))
+    bulk_upsert_tags(db, {publication_id: tags})
 
 # def ingest_publication(db: Session, pub: Publication, text: str) -> None:
 #     # 1) Chunk
@@ -120,13 +430,11 @@ def upsert_tags(db: Session, publication_id: int, tags: list[str]):
 #     upsert_global_documents(docs)
 
 
-def ingest_publication(db: Session, pub: Publication, text: str) -> None:
-    print(f"Ingesting publication {pub.id}...")
-    
-    # Generate AI sectioned summaries
-    sections = generate_section_summaries(pub.title, text, pub.abstract)
-    print("sections", sections.model_dump())  # debugging
+def _no_progress(stage: str) -> None:
+    pass
 
+def apply_section_summaries(pub: Publication, sections) -> None:
+    """Copy the AI-generated fields from a `SectionSummaries` onto `pub` (tags are upserted separately)."""
     # Summaries
     pub.summary_of_abstract = sections.abstract_summary
     pub.summary_for_scientist = sections.scientist_summary
@@ -144,35 +452,260 @@ def ingest_publication(db: Session, pub: Publication, text: str) -> None:
     pub.consensus_disagreement = jsonable_encoder(sections.consensus)
     pub.faqs = jsonable_encoder(sections.faqs)
 
-    # Tags
-    upsert_tags(db, pub.id, sections.tags)
+def publication_chunks(pub: Publication, text: str, chunks: List[Document] | None = None) -> List[Document]:
+    """Chunk `text` (unless already-streamed `chunks` are given) and attach the publication metadata."""
+    docs = chunks if chunks is not None else chunk_text(text)
+    for i, d in enumerate(docs):
+        d.metadata.update({
+            "publication_id": pub.id,
+            "title": pub.title,
+            "chunk_id": i+1,
+            "year": pub.date_year,
+            "organism": pub.organism,
+            "environment": pub.environment,
+            "type": "publication_chunk"
+        })
+    return docs
+
+# -------- Content-addressed uploads / dedup --------
+def _blobs_dir() -> str:
+    d = os.path.join(settings.UPLOADS_DIR, "blobs")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def store_upload(fileobj, suffix: str = ".pdf") -> tuple[str, str]:
+    """Stream an upload into content-addressed storage; returns (sha256, path).
+
+    The hash is computed while copying in 1 MiB blocks, so the upload is never
+    held in memory. Identical uploads share one file.
+    """
+    h = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=_blobs_dir(), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while block := fileobj.read(1 << 20):
+                h.update(block)
+                out.write(block)
+        digest = h.hexdigest()
+        path = os.path.join(_blobs_dir(), digest + suffix)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+        return digest, path
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file read in 1 MiB blocks (the same digest `store_upload` records for an upload)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            h.update(block)
+    return h.hexdigest()
+
+def find_ingested_duplicate(db: Session, content_sha256: str, exclude_id: int | None = None) -> Publication | None:
+    """An already-processed publication with the same content hash, if any."""
+    q = db.query(Publication).filter(
+        Publication.content_sha256 == content_sha256,
+        Publication.summary_of_abstract.isnot(None),
+    )
+    if exclude_id is not None:
+        q = q.filter(Publication.id != exclude_id)
+    for src in q.order_by(Publication.id):
+        if has_publication_index(src.id):
+            return src
+    return None
 
+_AI_FIELDS = (
+    "summary_of_abstract",
+    "summary_for_scientist",
+    "summary_for_investor",
+    "summary_for_mission_architect",
+    "knowledge_graph",
+    "knowledgeable_insights",
+    "knowledge_gaps",
+    "consensus_disagreement",
+    "faqs",
+)
+
+def reuse_ingested_publication(db: Session, src: Publication, pub: Publication, progress: Callable[[str], None] = _no_progress) -> None:
+    """Copy text, AI fields, tags and chunk vectors of `src` onto `pub`, skipping the LLM and embedding pipeline."""
+    progress("reusing")
+    for col in _AI_FIELDS:
+        setattr(pub, col, getattr(src, col))
+    pub.full_text = src.full_text
+    # Fingerprints cover this row's own title/metadata; carry over only stages that were current on `src`
+    if src.full_text:
+        backfill_fingerprints(src, src.full_text)
+    fresh = set(INGEST_STAGES) - stale_stages(src, src.full_text) if src.full_text else set()
+    pub.ingest_fingerprints = {}
+    record_fingerprints(pub, pub.full_text or "", fresh)
+    upsert_tags(db, pub.id, [t.name for t in src.tags])
     db.add(pub)
     db.commit()
-    print(f"AI summaries completed for publication {pub.id}.")
 
-    # -------------------------------
-    # 1️⃣ Chunk and add metadata
-    docs = chunk_text(text)
-    for i, d in enumerate(docs):
+    progress("indexing")
+    docs, vectors = publication_chunks_with_vectors(src.id)
+    for d in docs:
         d.metadata.update({
             "publication_id": pub.id,
             "title": pub.title,
-            "chunk_id": i+1,
             "year": pub.date_year,
             "organism": pub.organism,
             "environment": pub.environment,
-            "type": "publication_chunk"
         })
-    print("Docs prepared with metadata.")
+    upsert_global_documents(docs, vectors)
+    save_faq_embeddings(pub.id, pub.faqs)
+    print(f"Publication {pub.id} reused ingest results of identical publication {src.id}.")
 
-    # -------------------------------
-    # 2️⃣ Save per-publication FAISS
-    save_faiss_for_publication(pub.id, docs)
-    print("Per-publication FAISS saved.")
+# -------- Stage fingerprints --------
+INGEST_STAGES = ("summaries", "chunks", "vectors")
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:32]
+
+def stage_fingerprints(pub: Publication, text: str) -> dict[str, str]:
+    """Fingerprint of every input each ingest stage depends on."""
+    text_hash = text_sha256(text)
+    chunks = _fingerprint("chunks", text_hash, "recursive-character", CHUNK_SIZE, CHUNK_OVERLAP)
+    return {
+        "summaries": _fingerprint(
+            "summaries", text_hash, pub.title, pub.abstract,
+            SUMMARY_PROMPT_VERSION, settings.LLM_PROVIDER, settings.LLM_MODEL,
+            settings.SUMMARY_MODE, settings.SUMMARY_SINGLE_MAX_TOKENS, settings.SUMMARY_MAP_TOKENS, settings.ENRICH_MODE,
+        ),
+        "chunks": chunks,
+        "vectors": vectors_fingerprint(pub, chunks),
+    }
+
+def vectors_fingerprint(pub: Publication, chunks_fingerprint: str) -> str:
+    # vectors also carry the chunk metadata stored next to them
+    return _fingerprint(
+        "vectors", chunks_fingerprint, settings.EMBED_PROVIDER, settings.EMBED_MODEL,
+        pub.title, pub.date_year, pub.organism, pub.environment,
+    )
+
+def stored_chunks(pub: Publication) -> tuple[List[Document], str]:
+    """`pub`'s chunks as stored in the global index and the chunks fingerprint they stand for.
+
+    That is the recorded one when there is one; publications ingested before
+    fingerprints existed get one derived from the stored chunk texts.
+    """
+    docs, _ = publication_chunks_with_vectors(pub.id)
+    chunks = (pub.ingest_fingerprints or {}).get("chunks") or _fingerprint("stored-chunks", [d.page_content for d in docs])
+    return docs, chunks
+
+def reembed_publication(db: Session, pub: Publication, docs: List[Document], chunks_fingerprint: str) -> None:
+    """Re-embed chunks already in the global index (the "vectors" stage without any text)."""
+    for d in docs:
+        d.metadata.update({
+            "title": pub.title,
+            "year": pub.date_year,
+            "organism": pub.organism,
+            "environment": pub.environment,
+        })
+    upsert_global_documents(docs, embed_texts([d.page_content for d in docs]))
+    invalidate_answers(pub.id)
+    save_faq_embeddings(pub.id, pub.faqs)
+    pub.ingest_fingerprints = {
+        **(pub.ingest_fingerprints or {}),
+        "chunks": chunks_fingerprint,
+        "vectors": vectors_fingerprint(pub, chunks_fingerprint),
+    }
+    db.add(pub)
+    db.commit()
+    print(f"Re-embedded {len(docs)} stored chunks of publication {pub.id}.")
+
+def backfill_fingerprints(pub: Publication, text: str) -> bool:
+    """Adopt the stored summaries of a row ingested before fingerprints existed; True if it changed.
+
+    Such rows have no "summaries" fingerprint, which would otherwise make the
+    first --stale-only run re-summarize the whole corpus with LLM calls.
+    """
+    recorded = pub.ingest_fingerprints or {}
+    if "summaries" in recorded or not any(getattr(pub, col) for col in _AI_FIELDS):
+        return False
+    record_fingerprints(pub, text, ["summaries"])
+    return True
+
+def stale_stages(pub: Publication, text: str) -> set[str]:
+    """Stages whose recorded fingerprint differs from the current inputs."""
+    recorded = pub.ingest_fingerprints or {}
+    return {stage for stage, fp in stage_fingerprints(pub, text).items() if recorded.get(stage) != fp}
+
+def record_fingerprints(pub: Publication, text: str, stages: Iterable[str]) -> None:
+    current = stage_fingerprints(pub, text)
+    pub.ingest_fingerprints = {**(pub.ingest_fingerprints or {}), **{s: current[s] for s in stages}}
+
+def ingest_publication(
+    db: Session,
+    pub: Publication,
+    text: str,
+    progress: Callable[[str], None] = _no_progress,
+    chunks: List[Document] | None = None,
+    stages: Iterable[str] | None = None,
+) -> None:
+    """Run the ingest pipeline for `pub`; `stages` limits it to a subset of INGEST_STAGES (default: all)."""
+    stages = set(INGEST_STAGES if stages is None else stages)
+    logger.info("Ingesting publication %s (stages: %s)...", pub.id, ", ".join(sorted(stages)) or "none")
+    pub.full_text = text
+
+    if "summaries" in stages:
+        # Generate AI sectioned summaries
+        progress("summarizing")
+        sections = enrich_publication(pub.title, text, pub.abstract, progress=progress)
+        apply_section_summaries(pub, sections)
+
+        # Tags
+        progress("tagging")
+        upsert_tags(db, pub.id, sections.tags)
+        record_fingerprints(pub, text, ["summaries"])
+
+        db.add(pub)
+        db.commit()
+        logger.info("AI summaries completed for publication %s.", pub.id)
+
+    if stages & {"chunks", "vectors"} == {"vectors"} and chunks is None:
+        # Chunking inputs are unchanged, so the chunks already in the index are reused as-is
+        docs, chunks_fp = stored_chunks(pub)
+        if docs:
+            progress("embedding")
+            reembed_publication(db, pub, docs, chunks_fp)
+            return
+
+    if stages & {"summaries", "vectors"}:
+        # FAQ questions follow both the generated FAQs and the embedding model
+        save_faq_embeddings(pub.id, pub.faqs)
+
+    if not stages & {"chunks", "vectors"}:
+        db.add(pub)
+        db.commit()
+        return
 
     # -------------------------------
-    # 3️⃣ Update global FAISS
-    upsert_global_documents(docs)
-    print("Global FAISS updated.")
+    # 1️⃣ Chunk and add metadata
+    progress("chunking")
+    docs = publication_chunks(pub, text, chunks)
+    logger.debug("Docs prepared with metadata.")
+
+    # Embed every chunk exactly once; the vectors are reused by every index write
+    progress("embedding")
+    vectors = embed_texts([d.page_content for d in docs])
+    logger.debug("Embedded %d chunks.", len(docs))
 
+    # -------------------------------
+    # 2️⃣ Update global FAISS (replaces this publication's previous chunks;
+    #    single-publication QA filters the same index by publication_id)
+    progress("indexing")
+    upsert_global_documents(docs, vectors, publication_ids=[pub.id])
+    invalidate_answers(pub.id)
+    record_fingerprints(pub, text, ["chunks", "vectors"])
+    db.add(pub)
+    db.commit()
+    logger.info("Global FAISS updated for publication %s.", pub.id)
@@ -0,0 +1,80 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from .config import get_settings
+
+settings = get_settings()
+
+@dataclass
+class IngestJob:
+    id: str
+    publication_id: int
+    status: str = "queued"          # queued | running | succeeded | failed
+    stage: Optional[str] = None     # current/last pipeline stage
+    stages: List[dict] = field(default_factory=list)  # [{"stage", "started_at", "finished_at"}]
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+class IngestJobRunner:
+    """Bounded worker pool for ingestion jobs, with in-memory status tracking.
+
+    Jobs are kept per process; the most recent `max_jobs` are retained for polling.
+    """
+
+    def __init__(self, workers: int, max_jobs: int = 1000):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self.max_jobs = max_jobs
+
+    def submit(self, publication_id: int, fn: Callable[[Callable[[str], None]], None]) -> IngestJob:
+        """Run `fn(progress)` in the pool; `fn` calls `progress(stage)` as it advances."""
+        job = IngestJob(id=uuid.uuid4().hex, publication_id=publication_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _progress(self, job: IngestJob, stage: str) -> None:
+        now = time.time()
+        with self._lock:
+            if job.stages and job.stages[-1]["finished_at"] is None:
+                job.stages[-1]["finished_at"] = now
+            job.stages.append({"stage": stage, "started_at": now, "finished_at": None})
+            job.stage = stage
+            job.updated_at = now
+
+    def _finish(self, job: IngestJob, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            if job.stages and job.stages[-1]["finished_at"] is None:
+                job.stages[-1]["finished_at"] = now
+            job.status = status
+            job.error = error
+            job.updated_at = now
+
+    def _run(self, job: IngestJob, fn: Callable[[Callable[[str], None]], None]) -> None:
+        with self._lock:
+            job.status = "running"
+            job.updated_at = time.time()
+        try:
+            fn(lambda stage: self._progress(job, stage))
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, "failed", f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, "succeeded")
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+ingest_jobs = IngestJobRunner(settings.INGEST_WORKERS)
@@ -1,9 +1,16 @@
 
+import asyncio
 from pydantic import BaseModel, Field
 from typing import List
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
-from .rag_graph import _llm
+from .rag_graph import _llm, merge_knowledge_graphs
+from .llm_cache import ainvoke_structured, invoke_structured
+from .llm_clients import map_concurrently
+from .chunking import pack_chunks
+from .config import get_settings
+
+settings = get_settings()
 
 class Node(BaseModel):
     id: str = Field(..., description="Unique identifier for the node (e.g., 'Perseverance').")
@@ -18,14 +25,8 @@ class KnowledgeGraph(BaseModel):
     nodes: List[Node]
     edges: List[Edge]
 
-def extract_knowledge_graph(text: str) -> KnowledgeGraph:
-    """
-    Extracts a knowledge graph from a given text.
-    """
-    llm = _llm()
-    parser = PydanticOutputParser(pydantic_object=KnowledgeGraph)
-
-    prompt = ChatPromptTemplate.from_messages(
+def _kg_prompt(parser: PydanticOutputParser) -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "system",
@@ -40,10 +41,36 @@ def extract_knowledge_graph(text: str) -> KnowledgeGraph:
         ]
     ).partial(format_instructions=parser.get_format_instructions())
 
-    chain = prompt | llm | parser
-    
-    # Limit the text size to avoid exceeding token limits
-    truncated_text = text[:12000]
-    
-    return chain.invoke({"text": truncated_text})
+def _kg_parts(text: str) -> List[str]:
+    if settings.SUMMARY_MODE == "single":
+        # Limit the text size to avoid exceeding token limits
+        return [text[:12000]]
+    # Long texts: one partial graph per token-budgeted part, merged afterwards
+    return pack_chunks(text, settings.SUMMARY_MAP_TOKENS)
 
+def _merge(graphs: List[KnowledgeGraph]) -> KnowledgeGraph:
+    if len(graphs) == 1:
+        return graphs[0]
+    return KnowledgeGraph.model_validate(merge_knowledge_graphs(g.model_dump() for g in graphs))
+
+def extract_knowledge_graph(text: str, bypass_cache: bool = False) -> KnowledgeGraph:
+    """
+    Extracts a knowledge graph from a given text.
+    """
+    parser = PydanticOutputParser(pydantic_object=KnowledgeGraph)
+    prompt = _kg_prompt(parser)
+
+    def _extract(part: str) -> KnowledgeGraph:
+        return invoke_structured(_llm, prompt.format_messages(text=part), parser, bypass=bypass_cache)
+
+    return _merge(map_concurrently(_extract, _kg_parts(text), settings.SUMMARY_MAP_CONCURRENCY))
+
+async def aextract_knowledge_graph(text: str, bypass_cache: bool = False) -> KnowledgeGraph:
+    """Async `extract_knowledge_graph`; parts are extracted concurrently."""
+    parser = PydanticOutputParser(pydantic_object=KnowledgeGraph)
+    prompt = _kg_prompt(parser)
+    graphs = await asyncio.gather(*[
+        ainvoke_structured(_llm, prompt.format_messages(text=part), parser, bypass=bypass_cache)
+        for part in _kg_parts(text)
+    ])
+    return _merge(list(graphs))
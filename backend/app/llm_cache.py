@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional, Type
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.output_parsers import PydanticOutputParser
+from pydantic import BaseModel, ValidationError
+from .config import get_settings
+
+settings = get_settings()
+
+
+class LLMResponseCache:
+    """Persistent SQLite cache of parsed structured-output LLM results.
+
+    Rows are keyed by (provider, model, sha256(rendered prompt + output schema))
+    and hold the validated Pydantic result as JSON, so a hit skips both the LLM
+    call and the parse/repair round-trip. Rows expire after `ttl_s` seconds and
+    the least recently used rows are evicted past `max_entries`. As in
+    `CachedEmbeddings`, hits only read (their `last_used` touches are buffered)
+    and the row count is kept in memory, so a put never counts the table.
+    """
+
+    _TOUCH_BATCH = 1000  # buffered last_used updates flushed at once
+    _EVICT_TO = 0.9  # evict down to this fraction of max_entries, so eviction (and a recount) is rare
+
+    def __init__(self, path: str, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: dict = {}  # (provider, model, prompt_hash) -> last hit time, not yet written
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " provider TEXT NOT NULL, model TEXT NOT NULL, prompt_hash TEXT NOT NULL,"
+            " schema TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (provider, model, prompt_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_last_used ON llm_responses (last_used)")
+        self._conn.commit()
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+
+    @staticmethod
+    def key(messages: List[BaseMessage], schema: Type[BaseModel]) -> str:
+        payload = json.dumps(
+            {
+                "messages": [(m.type, m.content) for m in messages],
+                "schema": schema.__name__,
+                "fields": sorted(schema.model_fields),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, provider: str, model: str, prompt_hash: str, schema: Type[BaseModel]) -> Optional[BaseModel]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_responses WHERE provider = ? AND model = ? AND prompt_hash = ?",
+                (provider, model, prompt_hash),
+            ).fetchone()
+            if row is None or (self.ttl_s and now - row[1] > self.ttl_s):
+                self.misses += 1
+                return None
+            self._touched[(provider, model, prompt_hash)] = now
+            if len(self._touched) >= self._TOUCH_BATCH:
+                self._flush_touches()
+                self._conn.commit()
+        try:
+            value = schema.model_validate_json(row[0])
+        except ValidationError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def _flush_touches(self) -> None:
+        """Write buffered last_used updates; caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE llm_responses SET last_used = ? WHERE provider = ? AND model = ? AND prompt_hash = ?",
+                [(t, *k) for k, t in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put(self, provider: str, model: str, prompt_hash: str, value: BaseModel) -> None:
+        now = time.time()
+        row = (type(value).__name__, value.model_dump_json(), now, now)
+        with self._lock:
+            self._flush_touches()
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO llm_responses (provider, model, prompt_hash, schema, value, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (provider, model, prompt_hash, *row),
+            )
+            if cur.rowcount:
+                self._rows += 1
+            else:  # a refresh (bypass) of an existing row
+                self._conn.execute(
+                    "UPDATE llm_responses SET schema = ?, value = ?, created_at = ?, last_used = ?"
+                    " WHERE provider = ? AND model = ? AND prompt_hash = ?",
+                    (*row, provider, model, prompt_hash),
+                )
+            if self.max_entries and self._rows > self.max_entries:
+                # Expired rows go first (lookups already ignore them); other processes may share the file, so recount
+                if self.ttl_s:
+                    self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_s,))
+                (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+                excess = self._rows - int(self.max_entries * self._EVICT_TO)
+                if self._rows > self.max_entries and excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM llm_responses WHERE rowid IN (SELECT rowid FROM llm_responses ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    self._rows -= excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    global _cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(settings.LLM_CACHE_PATH, settings.LLM_CACHE_TTL_S, settings.LLM_CACHE_MAX_ENTRIES)
+        return _cache
+
+
+def llm_cache_stats() -> Optional[dict]:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else None
+
+
+_REPAIR_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Fix the JSON to match the schema exactly. Return ONLY valid JSON."),
+        ("user", "JSON to fix:\n{content}\n\n{format_instructions}"),
+    ]
+)
+
+
+def _parse_with_repair(llm, parser: PydanticOutputParser, content: str) -> BaseModel:
+    try:
+        return parser.parse(content)
+    except (ValidationError, OutputParserException):
+        # If the model drifts, give one best-effort repair attempt
+        repaired = llm.invoke(_REPAIR_PROMPT.format_messages(content=content, format_instructions=parser.get_format_instructions()))
+        return parser.parse(repaired.content)
+
+
+async def _aparse_with_repair(llm, parser: PydanticOutputParser, content: str) -> BaseModel:
+    try:
+        return parser.parse(content)
+    except (ValidationError, OutputParserException):
+        repaired = await llm.ainvoke(_REPAIR_PROMPT.format_messages(content=content, format_instructions=parser.get_format_instructions()))
+        return parser.parse(repaired.content)
+
+
+def _cache_lookup(messages: List[BaseMessage], parser: PydanticOutputParser, bypass: bool):
+    """(cache, key, hit) for a structured call; `key` is (provider, model, prompt_hash)."""
+    cache = get_llm_cache()
+    key = (settings.LLM_PROVIDER, settings.LLM_MODEL, LLMResponseCache.key(messages, parser.pydantic_object))
+    if cache is None or bypass:
+        return cache, key, None
+    return cache, key, cache.get(*key, parser.pydantic_object)
+
+
+def invoke_structured(
+    llm_factory: Callable,
+    messages: List[BaseMessage],
+    parser: PydanticOutputParser,
+    bypass: bool = False,
+) -> BaseModel:
+    """Run `messages` through the LLM and parse them with `parser`, served from the response cache when possible.
+
+    `bypass=True` forces a fresh LLM call (the fresh result still refreshes the cache).
+    """
+    cache, key, hit = _cache_lookup(messages, parser, bypass)
+    if hit is not None:
+        return hit
+    llm = llm_factory()
+    msg = llm.invoke(messages)
+    result = _parse_with_repair(llm, parser, msg.content)
+    if cache is not None:
+        cache.put(*key, result)
+    return result
+
+
+async def ainvoke_structured(
+    llm_factory: Callable,
+    messages: List[BaseMessage],
+    parser: PydanticOutputParser,
+    bypass: bool = False,
+) -> BaseModel:
+    """Async `invoke_structured` (same cache)."""
+    # SQLite reads and writes go to a worker thread so they never stall the enrichment event loop
+    cache, key, hit = await asyncio.to_thread(_cache_lookup, messages, parser, bypass)
+    if hit is not None:
+        return hit
+    llm = llm_factory()
+    msg = await llm.ainvoke(messages)
+    result = await _aparse_with_repair(llm, parser, msg.content)
+    if cache is not None:
+        await asyncio.to_thread(cache.put, *key, result)
+    return result
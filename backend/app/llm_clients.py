@@ -0,0 +1,326 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableConfig
+from .config import get_settings
+
+settings = get_settings()
+
+
+# -------- Retryable errors --------
+def _retryable_errors() -> Tuple[type, ...]:
+    errors: list = [TimeoutError, ConnectionError]
+    try:
+        import httpx
+        errors += [httpx.TimeoutException, httpx.ConnectError, httpx.RemoteProtocolError]
+    except ImportError:
+        pass
+    try:
+        import openai
+        errors += [openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+_RETRYABLE = _retryable_errors()
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, _RETRYABLE):
+        return True
+    # ollama.ResponseError carries the HTTP status (busy / overloaded server)
+    return getattr(e, "status_code", None) in (429, 500, 502, 503, 504)
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(settings.LLM_RETRY_MAX_S, settings.LLM_RETRY_BASE_S * (2 ** attempt)))
+
+
+# -------- Per-provider limiter + metrics --------
+class _ProviderLimiter:
+    """Caps in-flight calls to one provider and records queue depth / latency.
+
+    Shared by sync callers (thread pools) and async callers (event loop), so
+    the cap holds across both.
+    """
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._free = self.max_concurrency
+        # FIFO of parked callers; a release hands its slot straight to the head
+        # (a threading.Event for sync callers, a _Waiter for async ones)
+        self._waiters: deque = deque()
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self._latencies: deque = deque(maxlen=500)
+
+    def _take_or_queue(self, waiter) -> bool:
+        """Take a free slot, or queue `waiter`; caller holds the lock."""
+        if self._free and not self._waiters:
+            self._free -= 1
+            self.in_flight += 1
+            return True
+        self._waiters.append(waiter)
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        return False
+
+    def _release_slot(self) -> None:
+        """Pass a finished call's slot to the oldest waiter, or back to the pool."""
+        with self._lock:
+            self.in_flight -= 1
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+            self.waiting -= 1
+            self.in_flight += 1
+            if isinstance(waiter, _Waiter):
+                waiter.granted = True
+        if isinstance(waiter, _Waiter):
+            waiter.wake()
+        else:
+            waiter.set()
+
+    def acquire(self) -> None:
+        event = threading.Event()
+        with self._lock:
+            if self._take_or_queue(event):
+                return
+        event.wait()
+
+    async def aacquire(self) -> None:
+        # Parks on a future of this loop, so waiting costs neither a thread nor polling
+        waiter = _Waiter(self, asyncio.get_running_loop())
+        with self._lock:
+            if self._take_or_queue(waiter):
+                return
+        try:
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+                    self.waiting -= 1
+            if granted:  # cancelled after the slot was handed over: pass it on
+                self._release_slot()
+            raise
+
+    def release(self, latency_s: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self._latencies.append(latency_s)
+        self._release_slot()
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency_avg_s": round(sum(lat) / len(lat), 3) if lat else None,
+                "latency_p95_s": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3) if lat else None,
+            }
+
+
+class _Waiter:
+    """An async caller parked on a _ProviderLimiter, woken on its own event loop."""
+
+    def __init__(self, limiter: _ProviderLimiter, loop: asyncio.AbstractEventLoop):
+        self.limiter = limiter
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+    def wake(self) -> None:
+        # The releasing thread may not be running this loop
+        try:
+            self.loop.call_soon_threadsafe(self._set)
+        except RuntimeError:  # loop closed: nobody will use the slot
+            self.limiter._release_slot()
+
+    def _set(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+# -------- Managed client --------
+class ManagedChatModel(Runnable):
+    """A pooled chat model: concurrency-limited per provider, retried with jittered backoff.
+
+    Drop-in for the bare chat model (`.invoke`, `.ainvoke`, `.stream`,
+    `.astream`, and `prompt | llm` chains).
+    """
+
+    def __init__(self, factory: Callable[[], BaseChatModel], limiter: _ProviderLimiter):
+        self._factory = factory
+        self.model = factory()
+        self.limiter = limiter
+        # Async HTTP clients are bound to the event loop that opened them, so
+        # async calls get one model per loop (the ingest loop, the server loop, ...)
+        self._async_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BaseChatModel]" = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+
+    def _async_model(self) -> BaseChatModel:
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            model = self._async_models.get(loop)
+            if model is None:
+                model = self._async_models[loop] = self._factory()
+            return model
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            self.limiter.acquire()
+            t0, ok = time.perf_counter(), False
+            try:
+                out = self.model.invoke(input, config, **kwargs)
+                ok = True
+                return out
+            except Exception as e:
+                if attempt >= settings.LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                print(f"LLM {self.limiter.name} call failed ({type(e).__name__}), retry {attempt + 1}/{settings.LLM_MAX_RETRIES}")
+            finally:
+                self.limiter.release(time.perf_counter() - t0, ok)
+            self.limiter.record_retry()
+            time.sleep(_backoff(attempt))
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await self.limiter.aacquire()
+            t0, ok = time.perf_counter(), False
+            try:
+                out = await self._async_model().ainvoke(input, config, **kwargs)
+                ok = True
+                return out
+            except Exception as e:
+                if attempt >= settings.LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                print(f"LLM {self.limiter.name} call failed ({type(e).__name__}), retry {attempt + 1}/{settings.LLM_MAX_RETRIES}")
+            finally:
+                self.limiter.release(time.perf_counter() - t0, ok)
+            self.limiter.record_retry()
+            await asyncio.sleep(_backoff(attempt))
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        # Retry only before the first token; a half-streamed answer can't be replayed
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            self.limiter.acquire()
+            t0, ok, started = time.perf_counter(), False, False
+            try:
+                for chunk in self.model.stream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                ok = True
+                return
+            except Exception as e:
+                if started or attempt >= settings.LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+            finally:
+                self.limiter.release(time.perf_counter() - t0, ok)
+            self.limiter.record_retry()
+            time.sleep(_backoff(attempt))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await self.limiter.aacquire()
+            t0, ok, started = time.perf_counter(), False, False
+            try:
+                async for chunk in self._async_model().astream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                ok = True
+                return
+            except Exception as e:
+                if started or attempt >= settings.LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+            finally:
+                self.limiter.release(time.perf_counter() - t0, ok)
+            self.limiter.record_retry()
+            await asyncio.sleep(_backoff(attempt))
+
+
+# -------- Registry --------
+_clients: Dict[tuple, ManagedChatModel] = {}
+_limiters: Dict[str, _ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _build_chat_model(provider: str, model: str, temperature: float) -> BaseChatModel:
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        # Retries are handled by ManagedChatModel so they share the provider's concurrency budget
+        return ChatOpenAI(
+            model=model,
+            api_key=settings.OPENAI_API_KEY,
+            temperature=temperature,
+            timeout=settings.LLM_TIMEOUT_S,
+            max_retries=0,
+        )
+    elif provider == "ollama":
+        from langchain_ollama import ChatOllama
+        return ChatOllama(model=model, temperature=temperature, client_kwargs={"timeout": settings.LLM_TIMEOUT_S})
+    else:
+        raise ValueError("Unsupported LLM_PROVIDER")
+
+
+def get_chat_model(provider: Optional[str] = None, model: Optional[str] = None, temperature: float = 0) -> ManagedChatModel:
+    """Shared chat client for (provider, model, temperature); created once per process."""
+    provider = provider or settings.LLM_PROVIDER
+    model = model or settings.LLM_MODEL
+    key = (provider, model, temperature)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            limiter = _limiters.get(provider)
+            if limiter is None:
+                limiter = _limiters[provider] = _ProviderLimiter(provider, settings.LLM_MAX_CONCURRENCY)
+            client = _clients[key] = ManagedChatModel(lambda: _build_chat_model(provider, model, temperature), limiter)
+        return client
+
+
+def llm_client_stats() -> dict:
+    with _registry_lock:
+        limiters = dict(_limiters)
+        clients = [f"{p}:{m}" for p, m, _ in _clients]
+    return {"clients": clients, "providers": {name: lim.stats() for name, lim in limiters.items()}}
+
+
+def map_concurrently(fn: Callable, items: Iterable, max_workers: int) -> List:
+    """`list(map(fn, items))` on a thread pool; order is preserved.
+
+    The provider limiter still caps in-flight LLM calls, so `max_workers` only
+    bounds how many calls one document can queue at once.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(i) for i in items]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(fn, items))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from .db import Base
@@ -15,6 +15,9 @@ class Publication(Base):
     original_link: Mapped[str | None] = mapped_column(String(1024))
     metadata_json: Mapped[dict | None] = mapped_column(JSON, default={})
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    content_sha256: Mapped[str | None] = mapped_column(String(64), index=True)  # sha256 of the uploaded PDF / text
+    full_text: Mapped[str | None] = mapped_column(Text, deferred=True)  # extracted text, reused by dedup/re-ingest
+    ingest_fingerprints: Mapped[dict | None] = mapped_column(JSON, default={})  # stage -> fingerprint of its inputs
 
     # AI-generated fields
     summary_of_abstract: Mapped[str | None] = mapped_column(Text)
@@ -52,6 +55,8 @@ class Author(Base):
     publications: Mapped[list[Publication]] = relationship(
         "Publication", secondary="publication_authors", back_populates="authors"
     )
+    # One row per (name, orcid); a missing orcid counts as '' so bulk upserts can ON CONFLICT on it
+    __table_args__ = (Index("uq_authors_name_orcid", "name", func.coalesce(orcid, ""), unique=True),)
 
 class PublicationAuthor(Base):
     __tablename__ = "publication_authors"
@@ -1,31 +1,40 @@
-
-from pydantic import BaseModel, Field, ValidationError
-from typing import Optional, List,TypedDict
+import asyncio
+import logging
+from pydantic import BaseModel, Field, create_model
+import time
+import numpy as np
+from typing import Iterable, Optional, List,TypedDict
 from langgraph.graph import StateGraph, START, END
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
 from langchain.schema import Document
+from langchain_core.runnables import RunnableLambda
+from functools import lru_cache
 from .config import get_settings
-from .vectorstore import load_faiss_for_publication
+from .vectorstore import (
+    publication_similarity_search,
+    apublication_similarity_search,
+    apublication_similarity_search_batch,
+    acorpus_similarity_search,
+)
 from langchain.output_parsers import PydanticOutputParser
+from .llm_cache import invoke_structured
+from .llm_clients import get_chat_model, map_concurrently
+from .chunking import pack_chunks, pack_texts, token_len, truncate_tokens
 
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
-print('settings', settings)
+logger.debug("settings %s", settings)
 
 def _llm():
-    if settings.LLM_PROVIDER == "openai":
-        return ChatOpenAI(model=settings.LLM_MODEL, api_key=settings.OPENAI_API_KEY, temperature=0)
-    elif settings.LLM_PROVIDER == "ollama":
-        return ChatOllama(model=settings.LLM_MODEL, temperature=0)
-    else:
-        raise ValueError("Unsupported LLM_PROVIDER")
+    # Shared, concurrency-limited client with retry/backoff (see llm_clients.py)
+    return get_chat_model(settings.LLM_PROVIDER, settings.LLM_MODEL, temperature=0)
 
 class QAState(TypedDict):
     publication_id: int
     question: str
     k: int
+    query_vector: Optional[np.ndarray]  # question embedding already computed by the caller, if any
     docs: List[Document]
     answer: str
 
@@ -68,40 +77,260 @@ class SectionSummaries(BaseModel):
 
 
 def retrieve(state: QAState) -> QAState:
-    vs = load_faiss_for_publication(state["publication_id"])
-    docs = vs.similarity_search(state["question"], k=state["k"])
+    docs = publication_similarity_search(state["publication_id"], state["question"], k=state["k"])
     state["docs"] = docs
-    print('docs', docs)
     return state
 
+QA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an assistant for Q&A on a single NASA bioscience publication. "
+     "Answer **only** from the provided context. If unsure, say you don't know. "
+     "Return citations as [chunk #]."),
+    ("human", "Question: {question}\n\nContext:\n{context}\n\nAnswer:")
+])
+
+# ---------- Context assembly ----------
+_MERGE_GAP = 2  # chars (stripped whitespace) tolerated between adjacent chunks
+_MIN_PASSAGE_TOKENS = 64  # smallest truncated passage worth packing
+_BLOCK_OVERHEAD = 4  # tokens for the "[n] " marker and the blank line between blocks
+
+def merge_passages(docs: List[Document]) -> List[dict]:
+    """Merge retrieved chunks of one publication that overlap or touch into passages.
+
+    Offsets come from each chunk's `start_index`, so the CHUNK_OVERLAP text shared
+    by consecutive chunks appears once. Passages are ordered by the retrieval rank
+    of their best chunk; chunks without offsets (legacy indices) stay separate.
+    """
+    spans = []
+    for rank, d in enumerate(docs):
+        start = d.metadata.get("start_index")
+        spans.append({
+            "rank": rank,
+            "publication_id": d.metadata.get("publication_id"),
+            "start": start,
+            "end": None if start is None else start + len(d.page_content),
+            "text": d.page_content,
+            "docs": [d],
+        })
+    passages = [sp for sp in spans if sp["start"] is None]
+    cur = None
+    for sp in sorted((sp for sp in spans if sp["start"] is not None), key=lambda sp: (str(sp["publication_id"]), sp["start"])):
+        if cur is not None and sp["publication_id"] == cur["publication_id"] and sp["start"] <= cur["end"] + _MERGE_GAP:
+            if sp["end"] > cur["end"]:
+                gap = " " if sp["start"] > cur["end"] else ""
+                cur["text"] += gap + sp["text"][max(0, cur["end"] - sp["start"]):]
+                cur["end"] = sp["end"]
+            cur["docs"] += sp["docs"]
+            cur["rank"] = min(cur["rank"], sp["rank"])
+        else:
+            cur = sp
+            passages.append(cur)
+    return sorted(passages, key=lambda p: p["rank"])
+
+def assemble_context(docs: List[Document], budget_tokens: Optional[int] = None) -> tuple[str, List[dict]]:
+    """Numbered [n] context of merged passages within `budget_tokens` (QA_CONTEXT_TOKENS); returns (context, citations).
+
+    [1] is always the passage holding the top-ranked chunk; a passage that
+    overflows the budget is cut at a token boundary.
+    """
+    budget = settings.QA_CONTEXT_TOKENS if budget_tokens is None else budget_tokens
+    blocks, citations, used = [], [], 0
+    for p in merge_passages(docs):
+        text = p["text"]
+        n = token_len(text) + _BLOCK_OVERHEAD
+        if used + n > budget:
+            if budget - used - _BLOCK_OVERHEAD < _MIN_PASSAGE_TOKENS:
+                continue
+            text = truncate_tokens(text, budget - used - _BLOCK_OVERHEAD)
+            n = token_len(text) + _BLOCK_OVERHEAD
+        used += n
+        first = p["docs"][0].metadata
+        citations.append({
+            "ref": len(citations) + 1,
+            "publication_id": p["publication_id"],
+            "chunk_id": first.get("chunk_id"),
+            "chunk_ids": [d.metadata.get("chunk_id") for d in p["docs"]],
+            "title": first.get("title"),
+            "start_index": p["start"],
+            "end_index": p["end"],
+            "snippet": text[:200],
+        })
+        blocks.append(f"[{len(citations)}] {text}")
+    return "\n\n".join(blocks), citations
+
+def build_context(docs: List[Document]) -> str:
+    return assemble_context(docs)[0]
+
+def citations_for(docs: List[Document]) -> List[dict]:
+    """Citation list matching the [n] markers in `build_context`."""
+    return assemble_context(docs)[1]
+
 def generate(state: QAState) -> QAState:
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are an assistant for Q&A on a single NASA bioscience publication. "
-         "Answer **only** from the provided context. If unsure, say you don't know. "
-         "Return citations as [chunk #]."),
-        ("human", "Question: {question}\n\nContext:\n{context}\n\nAnswer:")
-    ])
-    ctx = []
-    for i, d in enumerate(state["docs"], start=1):
-        ctx.append(f"[{i}] {d.page_content[:1200]}")
-    chain = prompt | _llm()
-    out = chain.invoke({"question": state["question"], "context": "\n\n".join(ctx)})
+    chain = QA_PROMPT | _llm()
+    out = chain.invoke({"question": state["question"], "context": build_context(state["docs"])})
     state["answer"] = out.content
-    print('answer', state["answer"])
+    logger.debug("answer %s", state["answer"])
     return state
 
+async def astream_answer(publication_id: int, question: str, k: int, query_vector: Optional[np.ndarray] = None):
+    """Streaming single-document QA: yields ("citations", [...]), then ("token", text)..., then ("done", answer).
+
+    Only the FAISS search runs in a worker thread; tokens come from the chain's
+    `astream`, so the first one arrives after retrieval + model prefill. Pass
+    `query_vector` to search with an embedding the caller already has.
+    """
+    docs = await apublication_similarity_search(publication_id, question, k, vector=query_vector)
+    context, citations = assemble_context(docs)
+    yield "citations", citations
+    parts = []
+    chain = QA_PROMPT | _llm()
+    async for chunk in chain.astream({"question": question, "context": context}):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield "token", chunk.content
+    yield "done", "".join(parts)
+
+async def aretrieve(state: QAState) -> QAState:
+    # Async embedding (skipped when the caller passed the question vector); only the FAISS search is offloaded to a thread
+    state["docs"] = await apublication_similarity_search(
+        state["publication_id"], state["question"], k=state["k"], vector=state.get("query_vector")
+    )
+    return state
+
+async def agenerate(state: QAState) -> QAState:
+    chain = QA_PROMPT | _llm()
+    out = await chain.ainvoke({"question": state["question"], "context": build_context(state["docs"])})
+    state["answer"] = out.content
+    return state
+
+# ---------- Corpus-wide QA ----------
+CORPUS_QA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an assistant for Q&A across a corpus of NASA bioscience publications. "
+     "Answer **only** from the provided context. If it does not answer the question, say you don't know. "
+     "Cite publications as [P#]; when several papers agree or disagree, say so and cite each."),
+    ("human", "Question: {question}\n\nContext:\n{context}\n\nAnswer:")
+])
+
+def build_corpus_context(docs: List[Document], budget_tokens: int) -> tuple[str, List[dict]]:
+    """Group retrieved chunks by publication as [P#] blocks within `budget_tokens`; returns (context, citations).
+
+    Overlapping or adjacent chunks of a paper are merged first (`merge_passages`).
+    """
+    pubs: dict = {}
+    used = 0
+    for p in merge_passages(docs):
+        text = p["text"]
+        n = token_len(text)
+        if used + n > budget_tokens:
+            continue
+        used += n
+        md = p["docs"][0].metadata
+        pid = p["publication_id"]
+        if pid not in pubs:
+            pubs[pid] = {
+                "ref": f"P{len(pubs) + 1}",
+                "publication_id": pid,
+                "title": md.get("title"),
+                "year": md.get("year"),
+                "organism": md.get("organism"),
+                "environment": md.get("environment"),
+                "chunk_ids": [],
+                "texts": [],
+            }
+        pubs[pid]["chunk_ids"].extend(d.metadata.get("chunk_id") for d in p["docs"])
+        pubs[pid]["texts"].append(text)
+    blocks = []
+    for c in pubs.values():
+        header = f"[{c['ref']}] {c['title']}" + (f" ({c['year']})" if c["year"] else "")
+        blocks.append(header + "\n" + "\n".join(f"- {t}" for t in c.pop("texts")))
+    return "\n\n".join(blocks), list(pubs.values())
+
+async def answer_corpus_question(
+    question: str,
+    k: int = 8,
+    max_per_publication: int = 2,
+    year: Optional[str] = None,
+    organism: Optional[str] = None,
+    environment: Optional[str] = None,
+) -> dict:
+    """Corpus-wide RAG with metadata filters and per-publication citations.
+
+    Work before generation is bounded regardless of corpus size: at most
+    CORPUS_FETCH_K candidates, CORPUS_MAX_K chunks and CORPUS_CONTEXT_TOKENS of context.
+    """
+    t0 = time.perf_counter()
+    k = max(1, min(k, settings.CORPUS_MAX_K))
+    hits = await acorpus_similarity_search(question, k, max(1, max_per_publication), year, organism, environment)
+    t1 = time.perf_counter()
+    context, citations = build_corpus_context([d for d, _ in hits], settings.CORPUS_CONTEXT_TOKENS)
+    t2 = time.perf_counter()
+    if not citations:
+        answer = "I don't know: no publications matching the filters contain relevant passages."
+    else:
+        out = await (CORPUS_QA_PROMPT | _llm()).ainvoke({"question": question, "context": context})
+        answer = out.content
+    t3 = time.perf_counter()
+    return {
+        "answer": answer,
+        "citations": citations,
+        "timing": {
+            "retrieval_ms": round((t1 - t0) * 1000),
+            "assembly_ms": round((t2 - t1) * 1000),
+            "generation_ms": round((t3 - t2) * 1000),
+            "total_ms": round((t3 - t0) * 1000),
+        },
+    }
+
+# ---------- Batch single-document QA ----------
+async def answer_questions(
+    publication_id: int, questions: List[str], k: int = 6, vectors=None, concurrency: Optional[int] = None
+) -> List[dict]:
+    """Answer many questions about one publication; results in question order.
+
+    Retrieval is one embedding call plus one multi-query FAISS search; generation
+    runs with at most `concurrency` (QA_BATCH_CONCURRENCY) questions in flight.
+    A failed question yields an `error` entry instead of failing the batch.
+    """
+    t0 = time.perf_counter()
+    batch_docs = await apublication_similarity_search_batch(publication_id, questions, k, vectors=vectors)
+    retrieval_ms = round((time.perf_counter() - t0) * 1000)
+    sem = asyncio.Semaphore(max(1, concurrency or settings.QA_BATCH_CONCURRENCY))
+    chain = QA_PROMPT | _llm()
+
+    async def _one(question: str, docs: List[Document]) -> dict:
+        async with sem:
+            start = time.perf_counter()
+            context, citations = assemble_context(docs)
+            try:
+                out = await chain.ainvoke({"question": question, "context": context})
+                result = {"answer": out.content, "citations": citations}
+            except Exception as e:
+                result = {"answer": None, "citations": citations, "error": f"{type(e).__name__}: {e}"}
+            end = time.perf_counter()
+        result["timing"] = {
+            "retrieval_ms": retrieval_ms,  # shared by the whole batch
+            "queued_ms": round((start - t0) * 1000) - retrieval_ms,
+            "generation_ms": round((end - start) * 1000),
+            "total_ms": round((end - t0) * 1000),
+        }
+        return result
+
+    return list(await asyncio.gather(*[_one(q, d) for q, d in zip(questions, batch_docs)]))
+
+@lru_cache(maxsize=1)
 def build_qa_graph():
+    """Compiled once per process; nodes run natively under both `invoke` and `ainvoke`."""
     g = StateGraph(QAState)
     # add nodes
-    g.add_node("retrieve", retrieve)
-    g.add_node("generate", generate)
+    g.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))
+    g.add_node("generate", RunnableLambda(generate, afunc=agenerate))
 
     # add edges
     g.add_edge(START, "retrieve")
     g.add_edge("retrieve", "generate")
     g.add_edge("generate", END)
-    print('graph', g)
+    logger.debug("graph %s", g)
     return g.compile()
 
 # Simple LLM call for summaries on ingestion
@@ -129,8 +358,11 @@ def build_qa_graph():
 #         "conclusions": take(r"CONCLUSIONS")
 #     }
 # ---------- Main function ----------
-def generate_section_summaries(title: str, full_text: str, abstract: str) -> SectionSummaries:
-    llm = _llm()
+# Bump whenever the prompt or SectionSummaries schema changes, so re-ingest
+# (`python -m app.reingest --stale-only`) knows stored summaries are outdated.
+SUMMARY_PROMPT_VERSION = "1"
+
+def generate_section_summaries(title: str, full_text: str, abstract: str, bypass_cache: bool = False) -> SectionSummaries:
     parser = PydanticOutputParser(pydantic_object=SectionSummaries)
 
     # Build prompt with parser's format instructions (enforces JSON shape)
@@ -169,19 +401,163 @@ def generate_section_summaries(title: str, full_text: str, abstract: str) -> Sec
         ]
     ).partial(format_instructions=parser.get_format_instructions())
 
-    # Run the chain: prompt -> LLM -> parse
+    if use_map_reduce(full_text):
+        return _summaries_map_reduce(title, full_text, abstract, bypass_cache)
+
+    # Run the chain: prompt -> LLM -> parse (served from the response cache on repeat inputs)
     content = full_text[:120000] if full_text else ""
-    msg = llm.invoke(prompt.format_messages(content=content, abstract=abstract))
+    messages = prompt.format_messages(content=content, abstract=abstract)
+    return invoke_structured(_llm, messages, parser, bypass=bypass_cache)
+
+
+# ---------- Map-reduce for long papers ----------
+class ChunkNotes(BaseModel):
+    notes: List[str] = Field(..., description="Short factual bullet points: findings, methods, results, limitations and open questions stated in this part")
+    knowledge_graph: KnowledgeGraph = Field(..., description="Entities (nodes) and relationships (edges) mentioned in this part")
+
+class CondensedNotes(BaseModel):
+    notes: List[str] = Field(..., description="Merged, de-duplicated bullet points covering everything in the input notes")
+
+# SectionSummaries minus the knowledge graph, which is merged from the map step instead
+ReducedSummaries = create_model(
+    "ReducedSummaries",
+    **{name: (f.annotation, f) for name, f in SectionSummaries.model_fields.items() if name != "knowledge_graph"},
+)
+
+def use_map_reduce(full_text: str) -> bool:
+    if not full_text or settings.SUMMARY_MODE == "single":
+        return False
+    if settings.SUMMARY_MODE == "map_reduce":
+        return True
+    return token_len(full_text) > settings.SUMMARY_SINGLE_MAX_TOKENS
+
+def _node_key(node: dict) -> str:
+    label = node.get("id") or node.get("name") or node.get("label") or ""
+    return " ".join(str(label).split()).casefold()
+
+def merge_knowledge_graphs(graphs: Iterable[dict]) -> dict:
+    """Union of partial graphs; nodes are deduplicated by case/whitespace-insensitive id, edges by (source, relation, target)."""
+    graphs = list(graphs)
+    nodes: dict[str, dict] = {}
+    for g in graphs:
+        for n in g.get("nodes") or []:
+            key = _node_key(n) if isinstance(n, dict) else ""
+            if not key:
+                continue
+            if key in nodes:
+                for attr, value in n.items():
+                    nodes[key].setdefault(attr, value)
+            else:
+                nodes[key] = dict(n)
+
+    def _canonical(ref) -> str:
+        node = nodes.get(" ".join(str(ref).split()).casefold())
+        return (node.get("id") or node.get("name") or node.get("label")) if node else ref
+
+    edges, seen = [], set()
+    for g in graphs:
+        for e in g.get("edges") or []:
+            if not isinstance(e, dict):
+                continue
+            e = dict(e)
+            for end in ("source", "target"):
+                if e.get(end) is not None:
+                    e[end] = _canonical(e[end])
+            key = tuple(" ".join(str(e.get(f, "")).split()).casefold() for f in ("source", "relation", "target"))
+            if key not in seen:
+                seen.add(key)
+                edges.append(e)
+    return {"nodes": list(nodes.values()), "edges": edges}
+
+def map_request(title: str, part: str) -> tuple[list, PydanticOutputParser]:
+    """(messages, parser) for the map step over one part of a long paper."""
+    parser = PydanticOutputParser(pydantic_object=ChunkNotes)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a precise assistant for scientific summarization. You see one part of a longer paper. "
+                "Extract what this part states; do not invent details. "
+                "For the knowledge graph, identify key entities (people, places, concepts, technologies) "
+                "as nodes and their relationships as edges.\n"
+                "Return ONLY valid JSON that conforms exactly to the schema and format instructions.",
+            ),
+            ("user", "Title: {title}\n\nPaper part:\n{content}\n\nFORMAT INSTRUCTIONS:\n{format_instructions}"),
+        ]
+    ).partial(format_instructions=parser.get_format_instructions())
+    return prompt.format_messages(title=title, content=part), parser
+
+def _map_part(title: str, part: str, bypass_cache: bool) -> Optional[ChunkNotes]:
     try:
-        print('output from llm ', msg.content)
-        return parser.parse(msg.content)
-    except ValidationError as ve:
-        # If the model drifts, give one best-effort repair attempt by asking Mistral to fix to schema
-        repair_prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", "Fix the JSON to match the schema exactly. Return ONLY valid JSON."),
-                ("user", f"JSON to fix:\n{msg.content}\n\n{parser.get_format_instructions()}"),
-            ]
-        )
-        repaired = llm.invoke(repair_prompt.format_messages())
-        return parser.parse(repaired.content)
\ No newline at end of file
+        return invoke_structured(_llm, *map_request(title, part), bypass=bypass_cache)
+    except Exception as e:
+        # One unreadable part shouldn't sink the whole paper
+        print(f"Map step failed for a part of '{title}': {e}")
+        return None
+
+def collapse_notes(title: str, notes: List[str], bypass_cache: bool) -> List[str]:
+    """Condense notes group-by-group until they fit the reduce budget (a few rounds at most)."""
+    parser = PydanticOutputParser(pydantic_object=CondensedNotes)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "Merge these notes from a scientific paper into fewer, de-duplicated bullet points. "
+                "Keep every distinct fact. Return ONLY valid JSON that conforms exactly to the schema and format instructions.",
+            ),
+            ("user", "Title: {title}\n\nNotes:\n{notes}\n\nFORMAT INSTRUCTIONS:\n{format_instructions}"),
+        ]
+    ).partial(format_instructions=parser.get_format_instructions())
+
+    def _condense(group: List[str]) -> List[str]:
+        messages = prompt.format_messages(title=title, notes="\n".join(f"- {n}" for n in group))
+        return invoke_structured(_llm, messages, parser, bypass=bypass_cache).notes
+
+    for _ in range(3):
+        if token_len("\n".join(notes)) <= settings.SUMMARY_REDUCE_TOKENS:
+            break
+        groups = pack_texts(notes, settings.SUMMARY_REDUCE_TOKENS)
+        if len(groups) == 1:
+            break
+        notes = [n for condensed in map_concurrently(_condense, groups, settings.SUMMARY_MAP_CONCURRENCY) for n in condensed]
+    return notes
+
+def _summaries_map_reduce(title: str, full_text: str, abstract: str, bypass_cache: bool = False) -> SectionSummaries:
+    """Summarize a long paper: concurrent per-part notes + partial graphs (map), then one structured reduce call.
+
+    Wall-clock time grows with len(parts) / concurrency rather than with the paper's length.
+    """
+    parts = pack_chunks(full_text, settings.SUMMARY_MAP_TOKENS)
+    mapped = map_concurrently(lambda p: _map_part(title, p, bypass_cache), parts, settings.SUMMARY_MAP_CONCURRENCY)
+    mapped = [m for m in mapped if m is not None]
+    if not mapped:
+        raise ValueError(f"Map step failed for every part of '{title}'")
+    print(f"Map-reduce summary for '{title}': {len(parts)} parts, {len(mapped)} mapped")
+
+    graph = merge_knowledge_graphs(m.knowledge_graph.model_dump() for m in mapped)
+    notes = collapse_notes(title, [n for m in mapped for n in m.notes], bypass_cache)
+
+    parser = PydanticOutputParser(pydantic_object=ReducedSummaries)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a precise assistant for scientific summarization. "
+                "You are given notes extracted from every part of a paper; base your answer only on them. "
+                "For the FAQ section, generate 3-5 common questions and answers that a reader might have. "
+                "Return ONLY valid JSON that conforms exactly to the schema and format instructions.",
+            ),
+            (
+                "user",
+                "Title: {title}\n\nAbstract: {abstract}\n\n"
+                "Notes from the full paper:\n{notes}\n\n"
+                "Provide: a concise summary of the abstract; summaries for scientists, investors and mission "
+                "architects (max 70 words each); scientific progress insights; knowledge gaps; consensus and "
+                "debates; 3-5 FAQs with answers; and tags or keywords that summarize the paper.\n\n"
+                "FORMAT INSTRUCTIONS:\n{format_instructions}",
+            ),
+        ]
+    ).partial(format_instructions=parser.get_format_instructions())
+    messages = prompt.format_messages(title=title, abstract=abstract, notes="\n".join(f"- {n}" for n in notes))
+    reduced = invoke_structured(_llm, messages, parser, bypass=bypass_cache)
+    return SectionSummaries(**reduced.model_dump(), knowledge_graph=graph)
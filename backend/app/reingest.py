@@ -0,0 +1,115 @@
+"""Re-run ingest stages whose inputs changed.
+
+    python -m app.reingest [--stale-only] [--ids 1,2,3] [--dry-run]
+
+Every publication records a fingerprint per stage (see
+`ingestion.stage_fingerprints`): summaries depend on the text, title, abstract,
+prompt version and LLM; chunks on the text and splitter parameters; vectors on
+the chunks, embedding model and chunk metadata. With --stale-only only the
+stages whose fingerprint changed are rerun, so swapping EMBED_MODEL re-embeds
+the corpus without a single summary LLM call. Without it every stage reruns.
+Rows summarized before fingerprints existed adopt their stored summaries on
+first sight instead of counting as stale.
+
+Text comes from `full_text`, the content-addressed upload, or a legacy
+UPLOADS_DIR/pub_<id>_<filename> upload. A vectors-only rerun re-embeds the
+chunk texts already stored in the global index, so it needs no text at all.
+"""
+import argparse
+import os
+from sqlalchemy.orm import undefer
+from .config import get_settings
+from .db import SessionLocal, init_db
+from . import models
+from .ingestion import (
+    INGEST_STAGES,
+    _pdf_to_text,
+    backfill_fingerprints,
+    ingest_publication,
+    reembed_publication,
+    stale_stages,
+    stored_chunks,
+    vectors_fingerprint,
+)
+
+settings = get_settings()
+
+
+def _legacy_upload(pub_id: int) -> str | None:
+    """A PDF stored as UPLOADS_DIR/pub_<id>_<filename> before uploads were content-addressed."""
+    prefix = f"pub_{pub_id}_"
+    for name in sorted(os.listdir(settings.UPLOADS_DIR)):
+        if name.startswith(prefix) and os.path.isfile(os.path.join(settings.UPLOADS_DIR, name)):
+            return os.path.join(settings.UPLOADS_DIR, name)
+    return None
+
+
+def _publication_text(pub: models.Publication) -> str | None:
+    if pub.full_text:
+        return pub.full_text
+    if pub.content_sha256:
+        blob = os.path.join(settings.UPLOADS_DIR, "blobs", pub.content_sha256 + ".pdf")
+        if os.path.exists(blob):
+            return _pdf_to_text(blob)
+    legacy = _legacy_upload(pub.id)
+    if legacy:
+        return _pdf_to_text(legacy)
+    return None
+
+
+def reingest(stale_only: bool = False, ids: list[int] | None = None, dry_run: bool = False) -> None:
+    init_db()
+    db = SessionLocal()
+    try:
+        query = db.query(models.Publication.id).order_by(models.Publication.id)
+        if ids:
+            query = query.filter(models.Publication.id.in_(ids))
+        pub_ids = [pid for (pid,) in query]
+        counts = {stage: 0 for stage in INGEST_STAGES}
+        skipped = []
+        for pid in pub_ids:
+            pub = db.get(models.Publication, pid, options=[undefer(models.Publication.full_text)])
+            text = _publication_text(pub)
+            if not text:
+                # No text anywhere: the vectors stage can still be rerun from the chunks stored in the index
+                docs, chunks_fp = stored_chunks(pub)
+                recorded = (pub.ingest_fingerprints or {}).get("vectors")
+                if not docs:
+                    skipped.append(pid)
+                elif not stale_only or recorded != vectors_fingerprint(pub, chunks_fp):
+                    counts["vectors"] += 1
+                    print(f"publication {pid}: vectors (from stored chunks)")
+                    if not dry_run:
+                        reembed_publication(db, pub, docs, chunks_fp)
+                db.expunge_all()
+                continue
+            if backfill_fingerprints(pub, text) and not dry_run:
+                db.commit()
+            stages = stale_stages(pub, text) if stale_only else set(INGEST_STAGES)
+            if not stages:
+                continue
+            for stage in stages:
+                counts[stage] += 1
+            print(f"publication {pid}: {', '.join(sorted(stages))}")
+            if not dry_run:
+                ingest_publication(db, pub, text, stages=stages)
+            db.expunge_all()
+        print(f"Re-ran stages over {len(pub_ids)} publications: {counts}")
+        if skipped:
+            print(f"Skipped {len(skipped)} publications with no stored text, upload or indexed chunks: {skipped}")
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-run ingest stages for stored publications.")
+    ap.add_argument("--stale-only", action="store_true", help="only rerun stages whose input fingerprint changed")
+    ap.add_argument("--ids", help="comma-separated publication ids (default: all)")
+    ap.add_argument("--dry-run", action="store_true", help="report what would rerun without doing it")
+    args = ap.parse_args()
+    ids = [int(i) for i in args.ids.split(",")] if args.ids else None
+    reingest(stale_only=args.stale_only, ids=ids, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from collections import Counter
 from ..db import SessionLocal
 from .. import models
 from ..rag_graph import _llm
+from ..llm_cache import invoke_structured
 from pydantic import BaseModel, Field
 from typing import List
 
@@ -51,7 +52,7 @@ def get_analytics_overview(db: Session = Depends(get_db)):
     }
 
 @router.get("/compare", response_model=Comparison)
-def compare_publications(ids: str, db: Session = Depends(get_db)):
+def compare_publications(ids: str, refresh: bool = False, db: Session = Depends(get_db)):
     """
     Compares two publications side-by-side.
     """
@@ -70,7 +71,6 @@ def compare_publications(ids: str, db: Session = Depends(get_db)):
     text1 = f"Title: {pubs[0].title}\nAbstract: {pubs[0].abstract}\nKey Findings: {pubs[0].key_findings}\nMethods: {pubs[0].methods}\nConclusions: {pubs[0].conclusions}"
     text2 = f"Title: {pubs[1].title}\nAbstract: {pubs[1].abstract}\nKey Findings: {pubs[1].key_findings}\nMethods: {pubs[1].methods}\nConclusions: {pubs[1].conclusions}"
 
-    llm = _llm()
     parser = PydanticOutputParser(pydantic_object=Comparison)
 
     prompt = ChatPromptTemplate.from_messages(
@@ -87,9 +87,8 @@ def compare_publications(ids: str, db: Session = Depends(get_db)):
         ]
     ).partial(format_instructions=parser.get_format_instructions())
 
-    chain = prompt | llm | parser
-    
-    return chain.invoke({"text1": text1, "text2": text2})
+    # Cached per (model, rendered prompt); ?refresh=true forces a new comparison
+    return invoke_structured(_llm, prompt.format_messages(text1=text1, text2=text2), parser, bypass=refresh)
 
 @router.get("/program_manager_dashboard")
 def get_program_manager_dashboard(db: Session = Depends(get_db)):
@@ -1,12 +1,18 @@
 
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-import json, os, shutil
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Response
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from typing import List, Optional
+from functools import lru_cache
+from pydantic import TypeAdapter, create_model
+import json
 from ..db import SessionLocal
 from .. import models, schemas
-from ..ingestion import ingest_publication, _pdf_to_text, upsert_authors, upsert_tags
+from ..ingestion import (
+    ingest_publication, extract_and_chunk_pdf, upsert_authors,
+    store_upload, text_sha256, find_ingested_duplicate, reuse_ingested_publication,
+)
 from ..config import get_settings
+from ..jobs import ingest_jobs
 
 router = APIRouter(prefix="/publications", tags=["publications"])
 settings = get_settings()
@@ -18,18 +24,55 @@ def get_db():
     finally:
         db.close()
 
-@router.post("", response_model=schemas.PublicationOut)
-async def create_publication(
+def _run_ingest_job(pub_id: int, text: str | None, pdf_path: str | None, progress) -> None:
+    db = SessionLocal()
+    try:
+        pub = db.get(models.Publication, pub_id)
+        src = find_ingested_duplicate(db, pub.content_sha256, exclude_id=pub.id) if pub.content_sha256 else None
+        if src is not None:
+            reuse_ingested_publication(db, src, pub, progress)
+            return
+        chunks = None
+        if text is None:
+            progress("extracting_text")
+            text, chunks = extract_and_chunk_pdf(pdf_path)
+            if not text.strip():
+                raise ValueError("No text extracted from PDF.")
+        ingest_publication(db, pub, text, progress, chunks=chunks)
+        db.commit()
+    finally:
+        db.close()
+
+@router.post("", response_model=schemas.IngestJobOut, status_code=202)
+def create_publication(
     metadata_json: str = Form(...), 
     pdf: UploadFile | None = File(default=None),
     db: Session = Depends(get_db)):
+    """Store the publication and queue its ingest; returns the job to poll at GET /publications/jobs/{id}.
+
+    A plain `def`, so the upload copy and the SQLAlchemy work run in FastAPI's
+    threadpool instead of stalling in-flight QA / SSE streams on the event loop.
+    Jobs live in the `IngestJobRunner` of the process that accepted the upload:
+    with several uvicorn workers, GET /publications/jobs/{id} only finds a job
+    on that same worker (use sticky routing or poll the publication itself).
+    """
     try:
         meta = json.loads(metadata_json)
         pub_in = schemas.PublicationIn(**meta)
     except Exception as e:
         raise HTTPException(400, f"Invalid metadata_json: {e}")
-    # print(pub_in)
-    # return
+    if pub_in.text is not None and not pub_in.text.strip():
+        raise HTTPException(400, "No text extracted from PDF / provided.")
+    if not pub_in.text and pdf is None:
+        raise HTTPException(400, "Provide either metadata_json.text or a PDF file.")
+
+    # Content-address the input; identical uploads reuse an earlier ingest
+    save_path = None
+    if pub_in.text:
+        content_sha256 = text_sha256(pub_in.text)
+    else:
+        content_sha256, save_path = store_upload(pdf.file)
+
     pub = models.Publication(
         title=pub_in.title,
         abstract=pub_in.abstract,
@@ -42,7 +85,8 @@ async def create_publication(
         category_id=pub_in.category_id,
         subcategory_id=pub_in.subcategory_id,
         podcast_audio_path=pub_in.podcast_audio_path,
-        others_data=pub_in.others_data
+        others_data=pub_in.others_data,
+        content_sha256=content_sha256,
     )
     db.add(pub)
     db.commit()
@@ -53,39 +97,58 @@ async def create_publication(
     # upsert_tags(db, pub.id, pub_in.tags)
     db.commit(); db.refresh(pub)
 
-    # Prepare text
-    if pub_in.text:
-        text = pub_in.text
-    elif pdf is not None:
-        save_path = os.path.join(settings.UPLOADS_DIR, f"pub_{pub.id}_{pdf.filename}")
-        with open(save_path, "wb") as f:
-            shutil.copyfileobj(pdf.file, f)
-        text = _pdf_to_text(save_path)
-    else:
-        raise HTTPException(400, "Provide either metadata_json.text or a PDF file.")
-
-    if not text.strip():
-        raise HTTPException(400, "No text extracted from PDF / provided.")
-
-    # Ingest (vectorize + summarize)
-    db = SessionLocal()
-    
-    pub = db.get(models.Publication, pub.id)
-    # print('pub', pub_in)
-    # print('abstract', pub_in.abstract)
-    ingest_publication(db, pub, text)
-    db.commit(); db.refresh(pub)
-
-    # format authors
-    # pub.authors = [schemas.AuthorOut(**a.model_dump()) for a in pub.authors]
-    # pub.tags = [schemas.TagOut(**t.model_dump()) for t in pub.tags]
-
-    # Build output
-    return schemas.PublicationOut.from_orm(pub)
-
-@router.get("", response_model=List[schemas.PublicationOut])
-def list_publications(q: str | None = None, year_from: int | None = None, year_to: int | None = None, organism: str | None = None, category_id: int | None = None, subcategory_id: int | None = None, start_date: str | None = None, end_date: str | None = None, db: Session = Depends(get_db)):
-    query = db.query(models.Publication)
+    # Ingest (parse + summarize + vectorize, or reuse a duplicate) in the background; clients poll the job
+    job = ingest_jobs.submit(pub.id, lambda progress: _run_ingest_job(pub.id, pub_in.text, save_path, progress))
+    return schemas.IngestJobOut.model_validate(job)
+
+@router.get("/jobs/{job_id}", response_model=schemas.IngestJobOut)
+def get_ingest_job(job_id: str):
+    """Status of an ingest job accepted by this worker process (jobs are not shared across workers)."""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return schemas.IngestJobOut.model_validate(job)
+
+# -------- List projection --------
+_LIST_COLUMNS = ("id", "title", "date_month", "date_year", "organism", "environment", "created_at")
+_LIST_RELATIONSHIPS = ("tags", "authors", "category", "subcategory")
+_EXTRA_FIELDS = tuple(f for f in schemas.PublicationOut.model_fields if f not in schemas.PublicationListOut.model_fields)
+
+def _parse_fields(fields: str | None) -> tuple[str, ...]:
+    extra = tuple(sorted({f.strip() for f in (fields or "").split(",") if f.strip()}))
+    unknown = [f for f in extra if f not in _EXTRA_FIELDS and f not in schemas.PublicationListOut.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; choose from {list(_EXTRA_FIELDS)}")
+    return tuple(f for f in extra if f in _EXTRA_FIELDS)
+
+@lru_cache(maxsize=64)
+def _list_adapter(extra: tuple[str, ...]) -> TypeAdapter:
+    """Validator/serializer for list rows: PublicationListOut plus the requested PublicationOut fields."""
+    model = schemas.PublicationListOut
+    if extra:
+        # Optional so rows with empty AI sections (e.g. NULL knowledge_gaps) still serialize
+        fields = {f: (Optional[schemas.PublicationOut.model_fields[f].annotation], None) for f in extra}
+        model = create_model("PublicationListOut", __base__=schemas.PublicationListOut, **fields)
+    return TypeAdapter(List[model])
+
+def _list_options(extra: tuple[str, ...]) -> list:
+    """Load only the list columns (plus requested ones); heavy summary/JSON columns stay deferred."""
+    columns = _LIST_COLUMNS + tuple(f for f in extra if f not in _LIST_RELATIONSHIPS)
+    options = [
+        load_only(*[getattr(models.Publication, c) for c in columns]),
+        selectinload(models.Publication.tags),
+        joinedload(models.Publication.category),
+        joinedload(models.Publication.subcategory),
+    ]
+    if "authors" in extra:
+        options.append(selectinload(models.Publication.authors))
+    return options
+
+@router.get("", response_model=List[schemas.PublicationListOut])
+def list_publications(q: str | None = None, year_from: int | None = None, year_to: int | None = None, organism: str | None = None, category_id: int | None = None, subcategory_id: int | None = None, start_date: str | None = None, end_date: str | None = None, fields: str | None = None, db: Session = Depends(get_db)):
+    """Compact catalogue rows; `fields=abstract,faqs,...` adds PublicationOut fields to each row."""
+    extra = _parse_fields(fields)
+    query = db.query(models.Publication).options(*_list_options(extra))
     if q:
         like = f"%{q}%"
         query = query.filter(models.Publication.title.ilike(like) | models.Publication.abstract.ilike(like))
@@ -104,8 +167,10 @@ def list_publications(q: str | None = None, year_from: int | None = None, year_t
     if end_date:
         query = query.filter(models.Publication.created_at <= end_date)
     pubs = query.order_by(models.Publication.created_at.desc()).limit(200).all()
-    
-    return [schemas.PublicationOut.from_orm(p) for p in pubs]
+
+    # Serialize straight to JSON bytes; the response_model above only documents the default shape
+    adapter = _list_adapter(extra)
+    return Response(content=adapter.dump_json(adapter.validate_python(pubs, from_attributes=True)), media_type="application/json")
 
 @router.get("/{pub_id}", response_model=schemas.PublicationOut)
 def get_publication(pub_id: int, db: Session = Depends(get_db)):
@@ -17,21 +17,185 @@
 # def ask_qa(req: QARequest):
 #     return answer_question(req.query)
 
+import asyncio
+import json
+import time
+from typing import Optional
+import numpy as np
 from fastapi import APIRouter, HTTPException
-from ..schemas import QABody
-from ..rag_graph import build_qa_graph
-from ..vectorstore import load_faiss_for_publication
-import os
+from fastapi.responses import StreamingResponse
+from ..schemas import QABody, QABatchBody, CorpusQABody
+from ..rag_graph import build_qa_graph, astream_answer, answer_corpus_question, answer_questions, citations_for
+from ..vectorstore import aembed_queries, publication_index_version, publication_index_cache_stats
+from ..answer_cache import get_answer_cache, answer_cache_stats, embed_question, new_entry
+from ..faq_index import match_faq
+from ..config import get_settings
+from ..embeddings import embedding_cache_stats
+from ..llm_cache import llm_cache_stats
+from ..llm_clients import llm_client_stats
 
+settings = get_settings()
 router = APIRouter(prefix="/qa", tags=["qa"])
 graph = build_qa_graph()
 
-@router.post("/single-doc")
-def qa_single_doc(body: QABody):
-    # sanity: ensure index exists
-    try:
-        _ = load_faiss_for_publication(body.publication_id)
-    except Exception:
+async def _index_version(pub_id: int) -> int:
+    # sanity: ensure index exists (reads the index manifest, so off the event loop)
+    version = await asyncio.to_thread(publication_index_version, pub_id)
+    if version is None:
         raise HTTPException(404, "Vector index missing for this publication. Re-ingest it.")
-    result = graph.invoke({"publication_id": body.publication_id, "question": body.question, "k": body.k})
-    return {"answer": result["answer"]}
+    return version
+
+def _precomputed_answer(body: QABody, version: int, vec) -> Optional[dict]:
+    """The paper's matching FAQ, else a cached answer; a dict with source "faq" or "cache", or None."""
+    if settings.FAQ_MATCH_ENABLED:
+        faq = match_faq(body.publication_id, vec)
+        if faq is not None:
+            return {"source": "faq", "answer": faq["answer"], "citations": [],
+                    "matched_question": faq["question"], "similarity": round(faq["similarity"], 4)}
+    cache = get_answer_cache()
+    hit = cache.get(body.publication_id, version, vec, body.k) if cache is not None else None
+    if hit is not None:
+        entry, similarity = hit
+        return {"source": "cache", "answer": entry.answer, "citations": entry.citations,
+                "matched_question": entry.question, "similarity": round(similarity, 4)}
+    return None
+
+def _lookups_enabled() -> bool:
+    return settings.FAQ_MATCH_ENABLED or get_answer_cache() is not None
+
+async def _lookup_answer(body: QABody, version: int):
+    """(raw question vector, unit question vector, precomputed answer or None).
+
+    Both vectors are None when FAQ matching and the answer cache are off; on a
+    miss the raw one is reused for retrieval.
+    """
+    if not _lookups_enabled():
+        return None, None, None
+    query_vec, vec = await embed_question(body.question)
+    # FAQ matrices are read from disk on first use
+    return query_vec, vec, await asyncio.to_thread(_precomputed_answer, body, version, vec)
+
+def _store_answer(body: QABody, version: int, vec, answer: str, citations: list) -> None:
+    cache = get_answer_cache()
+    if cache is not None and vec is not None and answer:
+        cache.put(body.publication_id, version, new_entry(body.question, vec, answer, body.k, citations))
+
+@router.post("/single-doc")
+async def qa_single_doc(body: QABody):
+    version = await _index_version(body.publication_id)
+    query_vec, vec, hit = await _lookup_answer(body, version)
+    if hit is not None:
+        return {"answer": hit["answer"], "source": hit["source"], "cached": True,
+                "matched_question": hit["matched_question"], "similarity": hit["similarity"]}
+    result = await graph.ainvoke({"publication_id": body.publication_id, "question": body.question, "k": body.k,
+                                  "query_vector": query_vec})
+    _store_answer(body, version, vec, result["answer"], citations_for(result["docs"]))
+    return {"answer": result["answer"], "source": "rag", "cached": False}
+
+@router.post("/single-doc/batch")
+async def qa_single_doc_batch(body: QABatchBody):
+    """Answer many questions about one publication; `results` follow the order of `questions`.
+
+    Questions are embedded in one call and searched with one multi-query FAISS
+    search; FAQ / cached answers are served first and the rest are generated
+    with bounded concurrency (QA_BATCH_CONCURRENCY).
+    """
+    if not body.questions:
+        raise HTTPException(400, "questions must not be empty")
+    if len(body.questions) > settings.QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(400, f"At most {settings.QA_BATCH_MAX_QUESTIONS} questions per batch")
+    version = await _index_version(body.publication_id)
+    t0 = time.perf_counter()
+    vectors = await aembed_queries(body.questions)
+    embedding_ms = round((time.perf_counter() - t0) * 1000)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    items = [QABody(publication_id=body.publication_id, question=q, k=body.k) for q in body.questions]
+
+    results: list = [None] * len(items)
+    if _lookups_enabled():
+        def _lookups():
+            return [_precomputed_answer(item, version, vec) for item, vec in zip(items, unit)]
+        for i, hit in enumerate(await asyncio.to_thread(_lookups)):
+            if hit is not None:
+                results[i] = {**hit, "cached": True, "timing": {"total_ms": round((time.perf_counter() - t0) * 1000)}}
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    if pending:
+        answers = await answer_questions(
+            body.publication_id, [items[i].question for i in pending], body.k, vectors=vectors[pending]
+        )
+        for i, result in zip(pending, answers):
+            if result["answer"]:
+                _store_answer(items[i], version, unit[i], result["answer"], result["citations"])
+            results[i] = {"source": "rag", "cached": False, **result}
+
+    return {
+        "publication_id": body.publication_id,
+        "results": [{"question": q, **r} for q, r in zip(body.questions, results)],
+        "timing": {"embedding_ms": embedding_ms, "total_ms": round((time.perf_counter() - t0) * 1000)},
+    }
+
+@router.post("/corpus")
+async def qa_corpus(body: CorpusQABody):
+    """Cross-publication QA over the global index, optionally filtered by year / organism / environment."""
+    return await answer_corpus_question(
+        body.question,
+        k=body.k,
+        max_per_publication=body.max_per_publication,
+        year=body.year,
+        organism=body.organism,
+        environment=body.environment,
+    )
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/single-doc/stream")
+async def qa_single_doc_stream(body: QABody):
+    """Server-Sent Events: `citations`, then `token` events as the answer is generated, then `done` (with `source`)."""
+    version = await _index_version(body.publication_id)
+
+    async def events():
+        t0 = time.perf_counter()
+        timing = {}
+        try:
+            query_vec, vec, hit = await _lookup_answer(body, version)
+            if hit is not None:
+                yield _sse("citations", hit["citations"])
+                yield _sse("token", {"text": hit["answer"]})
+                timing["total_ms"] = round((time.perf_counter() - t0) * 1000)
+                yield _sse("done", {"answer": hit["answer"], "source": hit["source"], "cached": True,
+                                    "matched_question": hit["matched_question"], "similarity": hit["similarity"], "timing": timing})
+                return
+            citations = []
+            async for kind, payload in astream_answer(body.publication_id, body.question, body.k, query_vec):
+                if kind == "citations":
+                    citations = payload
+                    timing["retrieval_ms"] = round((time.perf_counter() - t0) * 1000)
+                    yield _sse("citations", payload)
+                elif kind == "token":
+                    timing.setdefault("first_token_ms", round((time.perf_counter() - t0) * 1000))
+                    yield _sse("token", {"text": payload})
+                else:
+                    timing["total_ms"] = round((time.perf_counter() - t0) * 1000)
+                    _store_answer(body, version, vec, payload, citations)
+                    yield _sse("done", {"answer": payload, "source": "rag", "cached": False, "timing": timing})
+        except Exception as e:
+            yield _sse("error", {"detail": f"{type(e).__name__}: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/cache-stats")
+def qa_cache_stats():
+    return {
+        "publication_indices": publication_index_cache_stats(),
+        "embeddings": embedding_cache_stats(),
+        "llm_responses": llm_cache_stats(),
+        "llm_clients": llm_client_stats(),
+        "answers": answer_cache_stats(),
+    }
@@ -133,6 +133,45 @@ class PublicationOut(BaseModel):
         from_attributes = True
 
 
+class PublicationListOut(BaseModel):
+    """Compact catalogue row for GET /publications; `fields=` opts into any other PublicationOut field."""
+    id: int
+    title: str
+    date_month: Optional[str] = None
+    date_year: Optional[int] = None
+    organism: Optional[str] = None
+    environment: Optional[str] = None
+    tags: List[TagOut] = []
+    category: Optional[CategoryOut] = None
+    subcategory: Optional[SubCategoryOut] = None
+
+    class Config:
+        from_attributes = True
+
+
+# -------------------------
+# Ingestion jobs
+# -------------------------
+class IngestStageOut(BaseModel):
+    stage: str
+    started_at: float
+    finished_at: Optional[float] = None
+
+
+class IngestJobOut(BaseModel):
+    id: str
+    publication_id: int
+    status: str
+    stage: Optional[str] = None
+    stages: List[IngestStageOut] = []
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+    class Config:
+        from_attributes = True
+
+
 # -------------------------
 # QA
 # -------------------------
@@ -141,6 +180,19 @@ class QABody(BaseModel):
     question: str
     k: int = 6
 
+class QABatchBody(BaseModel):
+    publication_id: int
+    questions: List[str]
+    k: int = 6
+
+class CorpusQABody(BaseModel):
+    question: str
+    k: int = 8
+    max_per_publication: int = 2  # diversity: chunks from any one paper
+    year: Optional[str] = None
+    organism: Optional[str] = None  # case-insensitive substring
+    environment: Optional[str] = None  # case-insensitive substring
+
 
 # -------------------------
 # Category / SubCategory
@@ -1,55 +1,841 @@
+import asyncio
+import json
+import math
 import os
-from typing import List, Optional
+import shutil
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import faiss
+import numpy as np
 from langchain.docstore.document import Document
 from langchain_community.vectorstores import FAISS
-from .embeddings import get_embeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+from .embeddings import get_embeddings, embed_texts
 from .config import get_settings
 
 settings = get_settings()
 
 def _pub_dir(pub_id: int) -> str:
-    d = os.path.join(settings.INDICES_DIR, str(pub_id))
-    os.makedirs(d, exist_ok=True)
-    return d
+    return os.path.join(settings.INDICES_DIR, str(pub_id))
 
 def _global_dir() -> str:
     d = os.path.join(settings.INDICES_DIR, "global")
     os.makedirs(d, exist_ok=True)
     return d
 
-# -------- Per-publication FAISS --------
-def save_faiss_for_publication(pub_id: int, docs: List[Document]) -> None:
-    embeddings = get_embeddings()
-    vs = FAISS.from_documents(docs, embeddings)
-    vs.save_local(_pub_dir(pub_id))
-   
+def _chunk_doc_id(pub_id, chunk_id) -> str:
+    return f"pub-{pub_id}-chunk-{chunk_id}"
+
+# -------- Legacy per-publication FAISS --------
+# Publications ingested before the shared index keep their own directory under
+# INDICES_DIR/<pub_id> until `migrate_publication_indices` folds them into the
+# global index. They are only read, never written.
+class _PublicationIndexCache:
+    """Bounded LRU of loaded per-publication indices, keyed by publication id."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, FAISS]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pub_id: int) -> FAISS:
+        with self._lock:
+            vs = self._entries.get(pub_id)
+            if vs is not None:
+                self._entries.move_to_end(pub_id)
+                self.hits += 1
+                return vs
+            self.misses += 1
+        vs = FAISS.load_local(_pub_dir(pub_id), get_embeddings(), allow_dangerous_deserialization=True)
+        with self._lock:
+            if self.max_entries:
+                self._entries[pub_id] = vs
+                self._entries.move_to_end(pub_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return vs
+
+    def invalidate(self, pub_id: int) -> None:
+        with self._lock:
+            self._entries.pop(pub_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+_pub_index_cache = _PublicationIndexCache(settings.PUB_INDEX_CACHE_SIZE)
+
+def _has_legacy_index(pub_id: int) -> bool:
+    return os.path.exists(os.path.join(_pub_dir(pub_id), "index.faiss"))
 
 def load_faiss_for_publication(pub_id: int) -> FAISS:
-    embeddings = get_embeddings()
-    d = _pub_dir(pub_id)
-    return FAISS.load_local(d, embeddings, allow_dangerous_deserialization=True)
+    return _pub_index_cache.get(pub_id)
+
+def publication_index_cache_stats() -> dict:
+    return _pub_index_cache.stats()
+
+# -------- Global FAISS (segmented) --------
+# The global index is a list of immutable segments under INDICES_DIR/global:
+#   MANIFEST.json   {"version", "next_seq", "segments": [...], "tombstones": {pub_id: seq},
+#                    "retired": [{"name", "at"}]}
+#   seg-000001/     FAISS save_local dir (index.faiss + index.pkl)
+# Each ingest writes one small delta segment and publishes a new manifest; it
+# never rewrites existing segments. A publication's rows are live only in
+# segments whose seq is >= its tombstone, so re-ingesting a paper hides its
+# older chunks without touching the segments that hold them.
+# Deltas are merged size-tiered in the background (`_plan_compaction`);
+# `compact_global_index` folds all live rows into a fresh base segment.
+# Merged-away segments stay on disk ("retired") for GLOBAL_SEGMENT_GRACE_S so
+# processes on an older manifest can still load them.
+_MANIFEST = "MANIFEST.json"
+
+class _GlobalWriteLock:
+    """Re-entrant lock serializing manifest/segment writes across threads *and* processes.
+
+    The API server and the bulk ingestion CLI both write the global index, so
+    the in-process RLock is paired with an OS file lock on INDICES_DIR/global/.lock
+    held around each manifest read-modify-write.
+    """
+
+    def __init__(self):
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            try:
+                fh = open(os.path.join(_global_dir(), ".lock"), "a+b")
+                _lock_file(fh)
+            except BaseException:
+                self._rlock.release()
+                raise
+            self._fh = fh
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            fh, self._fh = self._fh, None
+            try:
+                _unlock_file(fh)
+            finally:
+                fh.close()
+        self._rlock.release()
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(fh) -> None:
+        fh.seek(0)
+        while True:
+            try:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # LK_LOCK gives up after ~10s; keep waiting like flock does
+                continue
+
+    def _unlock_file(fh) -> None:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(fh) -> None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(fh) -> None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+_write_lock = _GlobalWriteLock()
+_compaction_lock = threading.Lock()
+
+def _seg_name(seq: int) -> str:
+    return f"seg-{seq:06d}"
+
+def _seg_seq(name: str) -> int:
+    return int(name.rsplit("-", 1)[1])
+
+def _write_manifest(manifest: dict) -> None:
+    d = _global_dir()
+    tmp = os.path.join(d, _MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(d, _MANIFEST))
 
-# -------- Global FAISS --------
-def _load_global_vs(embeddings=None) -> Optional[FAISS]:
-    embeddings = embeddings or get_embeddings()
+def _read_manifest() -> dict:
     d = _global_dir()
     try:
-        return FAISS.load_local(d, embeddings, allow_dangerous_deserialization=True)
-    except Exception:
+        with open(os.path.join(d, _MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    manifest = {"version": 0, "next_seq": 1, "segments": [], "tombstones": {}}
+    if not os.path.exists(os.path.join(d, "index.faiss")):
+        return manifest  # nothing written yet; reads never take the write lock
+    with _write_lock:
+        if os.path.exists(os.path.join(d, _MANIFEST)):
+            return _read_manifest()
+        if os.path.exists(os.path.join(d, "index.faiss")):
+            # Adopt a pre-segment monolithic index as the first segment.
+            seg = os.path.join(d, _seg_name(0))
+            os.makedirs(seg, exist_ok=True)
+            for fname in ("index.faiss", "index.pkl"):
+                os.replace(os.path.join(d, fname), os.path.join(seg, fname))
+            manifest = {"version": 1, "next_seq": 1, "segments": [_seg_name(0)], "tombstones": {}}
+            _write_manifest(manifest)
+        return manifest
+
+def _manifest_stamp() -> Optional[tuple]:
+    """Cheap change marker for MANIFEST.json (it is always replaced, never edited in place)."""
+    try:
+        st = os.stat(os.path.join(_global_dir(), _MANIFEST))
+    except FileNotFoundError:
         return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
 
-def upsert_global_documents(docs: List[Document]) -> None:
-    embeddings = get_embeddings()
-    gvs = _load_global_vs(embeddings)
-    if gvs is None:
-        gvs = FAISS.from_documents(docs, embeddings)
-    else:
-        gvs.add_documents(docs)
-    gvs.save_local(_global_dir())
+def _build_postings(vs: FAISS) -> Dict[int, np.ndarray]:
+    """publication_id -> FAISS row ids of its chunks in `vs`."""
+    rows: Dict[int, List[int]] = {}
+    for row, doc_id in vs.index_to_docstore_id.items():
+        doc = vs.docstore.search(doc_id)
+        pub_id = (getattr(doc, "metadata", None) or {}).get("publication_id")
+        if pub_id is not None:
+            rows.setdefault(int(pub_id), []).append(row)
+    return {p: np.asarray(r, dtype="int64") for p, r in rows.items()}
 
-def global_similarity_search(query: str, k: int = 10) -> List[Document]:
-    embeddings = get_embeddings()
-    gvs = _load_global_vs(embeddings)
-    if gvs is None:
+_FILTER_FIELDS = ("year", "organism", "environment")
+
+def _build_pub_meta(vs: FAISS, postings: Dict[int, np.ndarray]) -> Dict[int, dict]:
+    """publication_id -> filterable metadata (year/organism/environment), read from its first chunk."""
+    meta = {}
+    for pub_id, rows in postings.items():
+        md = vs.docstore.search(vs.index_to_docstore_id[int(rows[0])]).metadata or {}
+        meta[pub_id] = {f: str(md[f]).strip().lower() if md.get(f) is not None else "" for f in _FILTER_FIELDS}
+    return meta
+
+@dataclass
+class _Segment:
+    name: str
+    seq: int
+    vs: FAISS
+    postings: Dict[int, np.ndarray]
+    pub_meta: Dict[int, dict] = field(default_factory=dict)
+
+    def is_live(self, pub_id: int, tombstones: Dict[int, int]) -> bool:
+        return tombstones.get(pub_id, -1) <= self.seq
+
+    def live_rows(self, tombstones: Dict[int, int]) -> Optional[np.ndarray]:
+        """Rows not hidden by a tombstone, or None when every row is live."""
+        dead = [p for p in self.postings if not self.is_live(p, tombstones)]
+        if not dead:
+            return None
+        live = [rows for p, rows in self.postings.items() if self.is_live(p, tombstones)]
+        return np.concatenate(live) if live else np.zeros(0, dtype="int64")
+
+    def doc(self, row: int) -> Document:
+        return self.vs.docstore.search(self.vs.index_to_docstore_id[int(row)])
+
+def _load_segment(name: str) -> _Segment:
+    vs = FAISS.load_local(os.path.join(_global_dir(), name), get_embeddings(), allow_dangerous_deserialization=True)
+    postings = _build_postings(vs)
+    return _Segment(name=name, seq=_seg_seq(name), vs=vs, postings=postings, pub_meta=_build_pub_meta(vs, postings))
+
+@dataclass
+class _GlobalSnapshot:
+    version: int = 0
+    segments: List[_Segment] = field(default_factory=list)
+    tombstones: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def publication_ids(self) -> set:
+        return {p for seg in self.segments for p in seg.postings if seg.is_live(p, self.tombstones)}
+
+    def publications_matching(self, year: Optional[str] = None, organism: Optional[str] = None, environment: Optional[str] = None) -> Optional[set]:
+        """Live publications whose chunk metadata matches the filters (None when no filter is set).
+
+        `year` must match exactly; `organism` / `environment` are case-insensitive substrings.
+        """
+        wanted = {"year": year, "organism": organism, "environment": environment}
+        wanted = {f: str(v).strip().lower() for f, v in wanted.items() if v not in (None, "")}
+        if not wanted:
+            return None
+        out = set()
+        for seg in self.segments:
+            for p, meta in seg.pub_meta.items():
+                if not seg.is_live(p, self.tombstones):
+                    continue
+                if all(meta[f] == v if f == "year" else v in meta[f] for f, v in wanted.items()):
+                    out.add(p)
+        return out
+
+    def search(
+        self, vec: np.ndarray, k: int, pub_id: Optional[int] = None, pub_ids: Optional[set] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search every segment and merge the per-segment top-k by distance.
+
+        `pub_id` / `pub_ids` restrict the search to those publications' rows via an ID selector.
+        """
+        return self.search_batch(vec, k, pub_id=pub_id, pub_ids=pub_ids)[0]
+
+    def search_batch(
+        self, vecs: np.ndarray, k: int, pub_id: Optional[int] = None, pub_ids: Optional[set] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """`search` for every row of `vecs` at once: one multi-query FAISS call per segment."""
+        hits: List[List[Tuple[float, _Segment, int]]] = [[] for _ in range(len(vecs))]
+        for seg in self.segments:
+            if pub_id is not None:
+                rows = seg.postings.get(pub_id)
+                if rows is None or not seg.is_live(pub_id, self.tombstones):
+                    continue
+            elif pub_ids is not None:
+                selected = [r for p, r in seg.postings.items() if p in pub_ids and seg.is_live(p, self.tombstones)]
+                if not selected:
+                    continue
+                rows = np.concatenate(selected)
+            else:
+                rows = seg.live_rows(self.tombstones)
+            n = seg.vs.index.ntotal if rows is None else len(rows)
+            if not n:
+                continue
+            q = np.array(vecs, dtype="float32")
+            if seg.vs._normalize_L2:
+                faiss.normalize_L2(q)
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows)) if rows is not None else None
+            dist, idx = seg.vs.index.search(q, min(k, n), params=params)
+            for out, drow, irow in zip(hits, dist, idx):
+                out.extend((float(d), seg, int(i)) for d, i in zip(drow, irow) if i != -1)
+        reverse = bool(self.segments) and self.segments[0].vs.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+        results = []
+        for h in hits:
+            h.sort(key=lambda x: x[0], reverse=reverse)
+            results.append([(seg.doc(row), d) for d, seg, row in h[:k]])
+        return results
+
+class _GlobalIndexHolder:
+    """Process-wide, in-memory view of the segmented global index.
+
+    Segments are loaded once and served from memory. MANIFEST.json is only
+    re-read when its stat (inode, mtime, size) changes; when the manifest version
+    changes (an ingest in this or another process), only segments not already
+    resident are loaded. Each segment keeps a posting list of FAISS rows per
+    publication so single-publication searches are restricted with an ID
+    selector instead of loading a separate index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = _GlobalSnapshot()
+        self._stamp: Optional[tuple] = None  # manifest file last parsed into the snapshot
+
+    def snapshot(self) -> _GlobalSnapshot:
+        # A stat per call; the manifest (and its tombstone map) is only re-parsed when the file changed
+        stamp = _manifest_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return self._snapshot
+        with self._lock:
+            stamp = _manifest_stamp()
+            if stamp is not None and stamp == self._stamp:
+                return self._snapshot
+            manifest = _read_manifest()
+            while manifest["version"] != self._snapshot.version:
+                resident = {seg.name: seg for seg in self._snapshot.segments}
+                try:
+                    segments = [resident.get(n) or _load_segment(n) for n in manifest["segments"]]
+                except (OSError, RuntimeError):
+                    # A segment was purged after a compaction this manifest predates; use the newer one
+                    latest = _read_manifest()
+                    if latest["version"] == manifest["version"]:
+                        raise
+                    manifest = latest
+                    continue
+                self._snapshot = _GlobalSnapshot(
+                    version=manifest["version"],
+                    segments=segments,
+                    tombstones={int(p): s for p, s in manifest["tombstones"].items()},
+                )
+            # Stamp taken before the read: a manifest replaced in between is simply parsed again next time
+            self._stamp = stamp
+            return self._snapshot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshot = _GlobalSnapshot()
+            self._stamp = None
+
+_global_index = _GlobalIndexHolder()
+
+def _write_segment(seq: int, docs: List[Document], vectors: np.ndarray) -> str:
+    """Write `docs` + pre-computed `vectors` as an immutable segment; never calls the embedding provider."""
+    ids = [_chunk_doc_id(d.metadata.get("publication_id"), d.metadata.get("chunk_id", i + 1)) for i, d in enumerate(docs)]
+    pairs = list(zip([d.page_content for d in docs], np.asarray(vectors, dtype="float32").tolist()))
+    vs = FAISS.from_embeddings(pairs, get_embeddings(), metadatas=[d.metadata for d in docs], ids=ids)
+    name = _seg_name(seq)
+    tmp = os.path.join(_global_dir(), name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    vs.save_local(tmp)
+    os.replace(tmp, os.path.join(_global_dir(), name))
+    return name
+
+def _commit_segment(docs: List[Document], vectors: np.ndarray, replaced: Iterable[int] = ()) -> None:
+    """Publish `docs` as a delta and tombstone every older chunk of their publications and of `replaced`.
+
+    With no docs only the tombstones are published (a re-ingest that produced no chunks).
+    """
+    pub_ids = {int(d.metadata["publication_id"]) for d in docs if d.metadata.get("publication_id") is not None}
+    pub_ids |= {int(p) for p in replaced}
+    with _write_lock:
+        manifest = _read_manifest()
+        seq = manifest["next_seq"]
+        manifest["next_seq"] = seq + 1
+        if docs:
+            manifest["segments"].append(_write_segment(seq, docs, vectors))
+        for p in pub_ids:
+            manifest["tombstones"][str(p)] = seq
+        manifest["version"] += 1
+        _write_manifest(manifest)
+        deltas = len(manifest["segments"]) - 1
+    for p in pub_ids:
+        _pub_index_cache.invalidate(p)
+    if deltas and not _compaction_lock.locked():
+        threading.Thread(target=_maybe_compact, name="global-index-compaction", daemon=True).start()
+
+@dataclass
+class _PendingBatch:
+    docs: List[Document]
+    vectors: np.ndarray
+    replaced: set = field(default_factory=set)  # publication ids whose older chunks are hidden even without docs
+    future: Future = field(default_factory=Future)
+
+class _GlobalIndexWriter:
+    """Single writer thread that group-commits chunk batches into the global index.
+
+    Ingest workers enqueue (docs, vectors) and wait on a future. The writer
+    drains everything pending (waiting up to GLOBAL_GROUP_COMMIT_MS for
+    stragglers), writes it as one delta segment and publishes one manifest
+    version, so concurrent ingests never overwrite each other. Writers in other
+    processes (e.g. the bulk CLI) are serialized by `_write_lock`'s file lock.
+    """
+
+    def __init__(self, window_ms: int):
+        self.window = max(0, window_ms) / 1000.0
+        self._queue: "queue.Queue[_PendingBatch]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.commits = 0
+        self.batches = 0
+
+    def submit(self, docs: List[Document], vectors: np.ndarray, replaced: Iterable[int] = ()) -> Future:
+        batch = _PendingBatch(docs=docs, vectors=np.asarray(vectors, dtype="float32"), replaced=set(replaced))
+        self._ensure_started()
+        self._queue.put(batch)
+        return batch.future
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="global-index-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self) -> List[_PendingBatch]:
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while True:
+            timeout = deadline - time.monotonic()
+            try:
+                pending.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._drain()
+            # A publication queued twice keeps only its latest batch; docs without one are all kept.
+            seen: set = set()
+            docs: List[Document] = []
+            vectors: List[np.ndarray] = []
+            replaced: set = set()
+            for b in reversed(pending):
+                keep = [i for i, d in enumerate(b.docs) if d.metadata.get("publication_id") is None or d.metadata["publication_id"] not in seen]
+                seen |= {d.metadata["publication_id"] for d in b.docs if d.metadata.get("publication_id") is not None}
+                seen |= b.replaced
+                replaced |= b.replaced
+                docs[:0] = [b.docs[i] for i in keep]
+                if keep:
+                    vectors.insert(0, b.vectors[keep])
+            try:
+                _commit_segment(docs, np.vstack(vectors) if vectors else np.zeros((0, 0), dtype="float32"), replaced)
+            except Exception as e:
+                for b in pending:
+                    b.future.set_exception(e)
+                continue
+            self.commits += 1
+            self.batches += len(pending)
+            for b in pending:
+                b.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "commits": self.commits, "batches": self.batches}
+
+_writer = _GlobalIndexWriter(settings.GLOBAL_GROUP_COMMIT_MS)
+
+def upsert_global_documents(
+    docs: List[Document],
+    vectors: Optional[np.ndarray] = None,
+    wait: bool = True,
+    publication_ids: Iterable[int] = (),
+) -> Future:
+    """Queue chunks for the global index, hiding earlier chunks of the same publications.
+
+    Pass `vectors` (one row per doc, e.g. from `embed_texts`) to reuse embeddings
+    that were already computed; otherwise the chunks are embedded here.
+    `publication_ids` are replaced too, so a re-ingest that produced no chunks
+    still hides the publication's old ones. With `wait=True` this returns once
+    the group commit holding the chunks is published and searchable.
+    """
+    publication_ids = set(publication_ids)
+    if not docs and not publication_ids:
+        future: Future = Future()
+        future.set_result(None)
+        return future
+    if vectors is None:
+        vectors = embed_texts([d.page_content for d in docs]) if docs else np.zeros((0, 0), dtype="float32")
+    future = _writer.submit(docs, vectors, publication_ids)
+    if wait:
+        future.result()
+    return future
+
+def global_writer_stats() -> dict:
+    return _writer.stats()
+
+def _live_row_ids(seg: _Segment, tombstones: Dict[int, int]) -> np.ndarray:
+    rows = seg.live_rows(tombstones)
+    return np.arange(seg.vs.index.ntotal, dtype="int64") if rows is None else np.sort(rows)
+
+def _reconstruct(seg: _Segment, rows: np.ndarray) -> np.ndarray:
+    """Stored vectors of `rows` in one batched FAISS call."""
+    if not len(rows):
+        return np.zeros((0, seg.vs.index.d), dtype="float32")
+    if len(rows) == seg.vs.index.ntotal and rows[0] == 0 and rows[-1] == len(rows) - 1:
+        return seg.vs.index.reconstruct_n(0, len(rows))
+    return seg.vs.index.reconstruct_batch(np.ascontiguousarray(rows, dtype="int64"))
+
+def _plan_compaction(snap: _GlobalSnapshot) -> Tuple[List[_Segment], bool]:
+    """Size-tiered merge policy: (segments to merge, whether the base is among them).
+
+    The first segment is the base; the rest are deltas, bucketed into tiers
+    whose sizes differ by a factor of GLOBAL_MAX_DELTA_SEGMENTS. Once a tier
+    holds that many deltas they are merged into one delta of the next tier.
+    Deltas are folded into the base only when together they reach
+    GLOBAL_COMPACT_BASE_RATIO of its size, so each row is rewritten a
+    logarithmic number of times rather than on every compaction.
+    """
+    if len(snap.segments) < 2:
+        return [], False
+    fanout = max(2, settings.GLOBAL_MAX_DELTA_SEGMENTS)
+    base, deltas = snap.segments[0], snap.segments[1:]
+    sizes = {}
+    for seg in snap.segments:
+        rows = seg.live_rows(snap.tombstones)
+        sizes[seg.name] = seg.vs.index.ntotal if rows is None else len(rows)
+    if sum(sizes[d.name] for d in deltas) >= settings.GLOBAL_COMPACT_BASE_RATIO * sizes[base.name]:
+        return list(snap.segments), True
+    tiers: Dict[int, List[_Segment]] = {}
+    for d in deltas:
+        tiers.setdefault(int(math.log(max(sizes[d.name], 1), fanout)), []).append(d)
+    for tier in sorted(tiers):
+        if len(tiers[tier]) >= fanout:
+            return tiers[tier], False
+    return [], False
+
+def _purge_retired() -> None:
+    """Delete segments retired by a compaction more than GLOBAL_SEGMENT_GRACE_S ago.
+
+    Retired segments are kept on disk for a grace period so processes still
+    serving an older manifest (another API worker, the bulk CLI) can load them.
+    """
+    cutoff = time.time() - settings.GLOBAL_SEGMENT_GRACE_S
+    with _write_lock:
+        manifest = _read_manifest()
+        expired = [r["name"] for r in manifest.get("retired", []) if r["at"] <= cutoff]
+        if not expired:
+            return
+        manifest["retired"] = [r for r in manifest["retired"] if r["at"] > cutoff]
+        _write_manifest(manifest)  # same version: readers have nothing to reload
+    for name in expired:
+        shutil.rmtree(os.path.join(_global_dir(), name), ignore_errors=True)
+
+def _merge_segments(full: bool = False) -> Optional[str]:
+    """Merge the segments chosen by `_plan_compaction` (or all of them when `full`) into one."""
+    if not _compaction_lock.acquire(blocking=False):
+        return None
+    try:
+        _purge_retired()
+        with _write_lock:
+            # Snapshot and reserve the merged seq together, so every delta written
+            # from here on sorts after the merged segment.
+            snap = _global_index.snapshot()
+            merged, with_base = (list(snap.segments), True) if full else _plan_compaction(snap)
+            if len(merged) < 2:
+                return None
+            manifest = _read_manifest()
+            seq = manifest["next_seq"]
+            manifest["next_seq"] = seq + 1
+            _write_manifest(manifest)
+        docs: List[Document] = []
+        vectors: List[np.ndarray] = []
+        for seg in merged:
+            rows = _live_row_ids(seg, snap.tombstones)
+            if not len(rows):
+                continue
+            vectors.append(_reconstruct(seg, rows))
+            docs.extend(seg.doc(r) for r in rows)
+        # The new segment is written outside the lock so group commits keep landing meanwhile
+        name = _write_segment(seq, docs, np.vstack(vectors)) if docs else None
+        names = {seg.name for seg in merged}
+        with _write_lock:
+            manifest = _read_manifest()
+            if not names <= set(manifest["segments"]):
+                # Another process already compacted some of these segments
+                if name:
+                    shutil.rmtree(os.path.join(_global_dir(), name), ignore_errors=True)
+                return None
+            rest = [n for n in manifest["segments"] if n not in names]
+            new = [name] if name else []
+            manifest["segments"] = new + rest if with_base else rest[:1] + new + rest[1:]
+            # A tombstone is only needed while some segment older than it remains
+            oldest = min((_seg_seq(n) for n in manifest["segments"]), default=seq)
+            manifest["tombstones"] = {p: s for p, s in manifest["tombstones"].items() if s > oldest}
+            now = time.time()
+            manifest.setdefault("retired", []).extend({"name": n, "at": now} for n in sorted(names))
+            manifest["version"] += 1
+            _write_manifest(manifest)
+        return name
+    finally:
+        _compaction_lock.release()
+
+def compact_global_index() -> Optional[str]:
+    """Fold every live row of the current segments into one new base segment.
+
+    Segments appended while compaction runs are kept as deltas on top of the new
+    base; the replaced segments are deleted after GLOBAL_SEGMENT_GRACE_S.
+    Returns the base segment name, or None if there was nothing to do or a
+    compaction is already running.
+    """
+    return _merge_segments(full=True)
+
+def _maybe_compact() -> None:
+    _merge_segments(full=False)
+
+def _embed_query(query: str) -> np.ndarray:
+    return np.asarray([get_embeddings().embed_query(query)], dtype="float32")
+
+async def _aembed_query(query: str) -> np.ndarray:
+    return np.asarray([await get_embeddings().aembed_query(query)], dtype="float32")
+
+async def aembed_queries(queries: List[str]) -> np.ndarray:
+    """Embed many queries in one provider call; (len(queries), dim) float32."""
+    return np.asarray(await get_embeddings().aembed_documents(list(queries)), dtype="float32")
+
+def global_similarity_search(query: str, k: int = 10) -> List[Tuple[Document, float]]:
+    snap = _global_index.snapshot()
+    if not snap.segments:
+        return []
+    return snap.search(_embed_query(query), k)
+
+def _diversify(hits: List[Tuple[Document, float]], k: int, max_per_publication: int) -> List[Tuple[Document, float]]:
+    """Best-first hits with at most `max_per_publication` chunks from any one publication."""
+    out, per_pub = [], {}
+    for doc, score in hits:
+        p = doc.metadata.get("publication_id")
+        if per_pub.get(p, 0) >= max_per_publication:
+            continue
+        per_pub[p] = per_pub.get(p, 0) + 1
+        out.append((doc, score))
+        if len(out) >= k:
+            break
+    return out
+
+def _corpus_search(
+    snap: _GlobalSnapshot, vec: np.ndarray, k: int, max_per_publication: int,
+    year: Optional[str], organism: Optional[str], environment: Optional[str],
+) -> List[Tuple[Document, float]]:
+    pub_ids = snap.publications_matching(year, organism, environment)
+    if pub_ids is not None and not pub_ids:
+        return []
+    # Over-fetch a bounded candidate pool so the per-publication cap can still fill k
+    fetch_k = max(k, min(settings.CORPUS_FETCH_K, k * max(1, settings.CORPUS_OVERFETCH)))
+    return _diversify(snap.search(vec, fetch_k, pub_ids=pub_ids), k, max_per_publication)
+
+async def acorpus_similarity_search(
+    query: str,
+    k: int = 8,
+    max_per_publication: int = 2,
+    year: Optional[str] = None,
+    organism: Optional[str] = None,
+    environment: Optional[str] = None,
+) -> List[Tuple[Document, float]]:
+    """Corpus-wide top-k over the global index with metadata filters and a per-publication cap.
+
+    Filters become FAISS ID selectors (from each segment's postings), so
+    filtered-out papers are never scored. The query is embedded asynchronously;
+    the search itself runs in a worker thread.
+    """
+    snap = await asyncio.to_thread(_global_index.snapshot)
+    if not snap.segments:
         return []
-    return gvs.similarity_search_with_score(query, k=k)
+    vec = await _aembed_query(query)
+    return await asyncio.to_thread(_corpus_search, snap, vec, k, max_per_publication, year, organism, environment)
+
+def _legacy_chunks_with_vectors(pub_id: int) -> List[Tuple[Document, np.ndarray]]:
+    legacy = load_faiss_for_publication(pub_id)
+    vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)
+    found = []
+    for i, vec in enumerate(vectors):
+        d = legacy.docstore.search(legacy.index_to_docstore_id[i])
+        metadata = {"publication_id": pub_id, "chunk_id": i + 1, **dict(d.metadata)}
+        found.append((Document(page_content=d.page_content, metadata=metadata), vec))
+    return found
+
+def publication_chunks_with_vectors(pub_id: int) -> Tuple[List[Document], np.ndarray]:
+    """Copies of one publication's live chunks and their stored vectors, in chunk order.
+
+    Publications not yet migrated into the global index are read from their
+    legacy per-publication directory.
+    """
+    snap = _global_index.snapshot()
+    found: List[Tuple[Document, np.ndarray]] = []
+    if pub_id not in snap.publication_ids and _has_legacy_index(pub_id):
+        found = _legacy_chunks_with_vectors(pub_id)
+    for seg in snap.segments:
+        rows = seg.postings.get(pub_id)
+        if rows is None or not seg.is_live(pub_id, snap.tombstones):
+            continue
+        for r, vec in zip(rows, _reconstruct(seg, rows)):
+            d = seg.doc(r)
+            found.append((Document(page_content=d.page_content, metadata=dict(d.metadata)), vec))
+    found.sort(key=lambda dv: dv[0].metadata.get("chunk_id") or 0)
+    if not found:
+        return [], np.zeros((0, 0), dtype="float32")
+    return [d for d, _ in found], np.vstack([v for _, v in found])
+
+def has_publication_index(pub_id: int) -> bool:
+    return pub_id in _global_index.snapshot().publication_ids or _has_legacy_index(pub_id)
+
+def publication_index_version(pub_id: int) -> Optional[int]:
+    """Changes whenever the publication is re-ingested (its tombstone seq); None if it has no index."""
+    snap = _global_index.snapshot()
+    if pub_id in snap.publication_ids:
+        return snap.tombstones.get(pub_id, 0)
+    return -1 if _has_legacy_index(pub_id) else None
+
+def publication_similarity_search(pub_id: int, query: str, k: int = 6) -> List[Document]:
+    """Top-k chunks of one publication, served from the resident global index.
+
+    Falls back to the legacy per-publication directory for papers that have not
+    been migrated yet.
+    """
+    snap = _global_index.snapshot()
+    if pub_id not in snap.publication_ids:
+        if _has_legacy_index(pub_id):
+            return load_faiss_for_publication(pub_id).similarity_search(query, k=k)
+        return []
+    return [doc for doc, _ in snap.search(_embed_query(query), k, pub_id=pub_id)]
+
+async def apublication_similarity_search(
+    pub_id: int, query: str, k: int = 6, vector: Optional[np.ndarray] = None
+) -> List[Document]:
+    """Async `publication_similarity_search`: the query is embedded with the async client and
+    only the CPU-bound FAISS search (and any segment reload) runs in a worker thread.
+
+    A `vector` already computed for `query` is searched as-is instead of embedding it again.
+    """
+    snap = await asyncio.to_thread(_global_index.snapshot)
+    if pub_id not in snap.publication_ids:
+        if _has_legacy_index(pub_id):
+            if vector is not None:
+                vs = await asyncio.to_thread(load_faiss_for_publication, pub_id)
+                return await asyncio.to_thread(vs.similarity_search_by_vector, np.asarray(vector, dtype="float32").tolist(), k)
+            return await asyncio.to_thread(publication_similarity_search, pub_id, query, k)
+        return []
+    vec = await _aembed_query(query) if vector is None else np.asarray(vector, dtype="float32").reshape(1, -1)
+    return [doc for doc, _ in await asyncio.to_thread(snap.search, vec, k, pub_id)]
+
+async def apublication_similarity_search_batch(
+    pub_id: int, queries: List[str], k: int = 6, vectors: Optional[np.ndarray] = None
+) -> List[List[Document]]:
+    """Top-k chunks of one publication for each query, in query order.
+
+    All queries are embedded in one call (unless `vectors` is given) and searched
+    with a single multi-query FAISS search over the resident index.
+    """
+    snap = await asyncio.to_thread(_global_index.snapshot)
+    if pub_id not in snap.publication_ids:
+        if _has_legacy_index(pub_id):
+            return [await asyncio.to_thread(publication_similarity_search, pub_id, q, k) for q in queries]
+        return [[] for _ in queries]
+    if vectors is None:
+        vectors = await aembed_queries(queries)
+    hits = await asyncio.to_thread(snap.search_batch, vectors, k, pub_id)
+    return [[doc for doc, _ in h] for h in hits]
+
+# -------- Migration --------
+def migrate_publication_indices(remove_legacy: bool = False) -> List[int]:
+    """Fold legacy INDICES_DIR/<pub_id> indices into the global index.
+
+    Vectors are copied as-is (no re-embedding) into a single new segment.
+    Publications already present in the global index are skipped. Returns the
+    migrated publication ids.
+    """
+    embeddings = get_embeddings()
+    present = _global_index.snapshot().publication_ids
+    migrated: List[int] = []
+    docs: List[Document] = []
+    vectors: List[np.ndarray] = []
+    for name in sorted(os.listdir(settings.INDICES_DIR)):
+        if not name.isdigit() or not _has_legacy_index(int(name)):
+            continue
+        pub_id = int(name)
+        if pub_id not in present:
+            legacy = FAISS.load_local(_pub_dir(pub_id), embeddings, allow_dangerous_deserialization=True)
+            vectors.append(legacy.index.reconstruct_n(0, legacy.index.ntotal))
+            for i in range(legacy.index.ntotal):
+                d = legacy.docstore.search(legacy.index_to_docstore_id[i])
+                d.metadata.setdefault("publication_id", pub_id)
+                d.metadata.setdefault("chunk_id", i + 1)
+                docs.append(d)
+            migrated.append(pub_id)
+        _pub_index_cache.invalidate(pub_id)
+    if docs:
+        upsert_global_documents(docs, np.vstack(vectors))
+    if remove_legacy:
+        for name in os.listdir(settings.INDICES_DIR):
+            if name.isdigit():
+                shutil.rmtree(_pub_dir(int(name)), ignore_errors=True)
+    return migrated
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["compact"]:
+        print(f"Compacted global index into {compact_global_index()}")
+    elif sys.argv[1:2] == ["migrate"]:
+        done = migrate_publication_indices(remove_legacy="--remove-legacy" in sys.argv)
+        print(f"Migrated {len(done)} publication indices into the global index: {done}")
+    else:
+        sys.exit("usage: python -m app.vectorstore migrate [--remove-legacy] | compact")
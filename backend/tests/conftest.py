@@ -0,0 +1,91 @@
+"""Shared fixtures: an isolated database / index directory, fake embeddings and a fake enrichment step.
+
+Settings are read when `app` is first imported (INDICES_DIR is relative to the
+working directory), so the environment is prepared here before any app import.
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="nsac-tests-")
+os.makedirs(os.path.join(_TMP, "run"))
+os.chdir(os.path.join(_TMP, "run"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_TMP}/test.db",
+    "EMBED_CACHE_ENABLED": "false",
+    "LLM_CACHE_ENABLED": "false",
+    "ANSWER_CACHE_ENABLED": "false",
+    "GLOBAL_GROUP_COMMIT_MS": "20",
+})
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from app import embeddings, vectorstore, answer_cache, ingestion  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.db import Base, engine  # noqa: E402
+from app.rag_graph import SectionSummaries  # noqa: E402
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic pseudo-random vectors per text; records every text sent to the provider."""
+
+    dim = 32
+
+    def __init__(self):
+        self.embedded: list[str] = []
+
+    def _vector(self, text: str) -> list[float]:
+        rng = np.random.default_rng(int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16))
+        return rng.random(self.dim).tolist()
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def fake_enrichment(title, full_text, abstract, **kwargs) -> SectionSummaries:
+    return SectionSummaries(
+        abstract_summary="a",
+        scientist_summary="s",
+        investor_summary="i",
+        mission_architect_summary="m",
+        knowledge_graph={"nodes": [], "edges": []},
+        faqs=[{"question": f"What is {title} about?", "answer": "Bone loss."}],
+        tags=["bone", title],
+    )
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch) -> FakeEmbeddings:
+    fake = FakeEmbeddings()
+    for module in (embeddings, vectorstore, answer_cache):
+        monkeypatch.setattr(module, "get_embeddings", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def fresh_store(monkeypatch, fake_embeddings):
+    """Empty database and global index, fake embeddings and no LLM calls during ingest."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    indices = get_settings().INDICES_DIR
+    shutil.rmtree(indices, ignore_errors=True)
+    os.makedirs(indices, exist_ok=True)
+    vectorstore._global_index.clear()
+    monkeypatch.setattr(ingestion, "enrich_publication", fake_enrichment)
+    yield
+    vectorstore._global_index.clear()
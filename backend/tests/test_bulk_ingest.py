@@ -0,0 +1,56 @@
+"""Bulk ingestion: in-batch duplicates and PDF page timeouts in the PDF pool."""
+import time
+from app import bulk_ingest, ingestion, models, vectorstore
+from app.db import SessionLocal
+from conftest import fake_enrichment
+
+TEXT = "Osteoblast activity fell in microgravity. " * 100
+
+
+def test_same_content_in_one_batch_is_enriched_and_embedded_once(fresh_store, fake_embeddings, monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(bulk_ingest, "enrich_publication", lambda *a, **kw: calls.append(a) or fake_enrichment(*a, **kw))
+    rows = [{"title": f"Osteoblasts {i}", "text_path": str(tmp_path / f"{i}.txt")} for i in range(3)]
+    texts = [(TEXT, ingestion.text_sha256(TEXT), None)] * 3
+    state = {"rows": {}}
+
+    assert bulk_ingest._ingest_batch(rows, texts, state, str(tmp_path / "state.json"), llm_workers=2) == 3
+    assert len(calls) == 1
+    chunks = [d.page_content for d in ingestion.chunk_text(TEXT)]
+    n_chunks = len(chunks)
+    assert [t for t in fake_embeddings.embedded if t in chunks] == chunks
+    assert all(entry["done"] and "error" not in entry for entry in state["rows"].values())
+
+    db = SessionLocal()
+    try:
+        for entry in state["rows"].values():
+            pub = db.get(models.Publication, entry["publication_id"])
+            assert pub.summary_of_abstract == "a"
+            assert len(vectorstore.publication_chunks_with_vectors(pub.id)[0]) == n_chunks
+    finally:
+        db.close()
+
+
+def test_in_process_extraction_times_out_a_hung_page(monkeypatch, tmp_path):
+    class Page:
+        def __init__(self, text, hang=False):
+            self.text, self.hang = text, hang
+
+        def extract_text(self):
+            if self.hang:
+                time.sleep(30)
+            return self.text
+
+    class Reader:
+        def __init__(self, path):
+            self.pages = [Page("first"), Page("stuck", hang=True), Page("last")]
+
+    monkeypatch.setattr(ingestion, "PdfReader", Reader)
+    monkeypatch.setattr(ingestion.settings, "PDF_PAGE_TIMEOUT_S", 0.2)
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+
+    t0 = time.perf_counter()
+    text, sha, error = bulk_ingest._read_row_text({"pdf_path": str(pdf)})
+    assert time.perf_counter() - t0 < 5
+    assert (text, sha, error) == ("first\n\nlast", ingestion.file_sha256(str(pdf)), None)
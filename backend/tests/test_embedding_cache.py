@@ -0,0 +1,68 @@
+"""The persistent embedding cache under concurrent sync and async callers."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.embeddings import CachedEmbeddings
+from conftest import FakeEmbeddings
+
+TEXTS = [f"chunk {i}" for i in range(50)]
+
+
+def _cache(tmp_path) -> tuple[CachedEmbeddings, FakeEmbeddings]:
+    inner = FakeEmbeddings()
+    return CachedEmbeddings(inner, "fake", "fake-32", str(tmp_path / "emb.sqlite"), max_entries=0), inner
+
+
+def test_concurrent_counts_are_exact(tmp_path):
+    cache, inner = _cache(tmp_path)
+    cache.embed_documents(TEXTS)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: cache.embed_documents(TEXTS), range(40)))
+    assert cache.stats()["hits"] == 40 * len(TEXTS)
+    assert cache.stats()["misses"] == len(TEXTS)
+    assert len(inner.embedded) == len(TEXTS)
+
+
+def test_async_lookups_run_off_the_event_loop(tmp_path):
+    cache, inner = _cache(tmp_path)
+    expected = cache.embed_documents(TEXTS)
+    loop_threads = set()
+    lookup = cache._lookup
+
+    def tracking_lookup(hashes):
+        loop_threads.add(threading.get_ident())
+        return lookup(hashes)
+
+    cache._lookup = tracking_lookup
+
+    async def run():
+        loop_thread = threading.get_ident()
+        docs = await asyncio.gather(*[cache.aembed_documents(TEXTS) for _ in range(10)])
+        queries = await asyncio.gather(*[cache.aembed_query(t) for t in TEXTS])
+        return loop_thread, docs, queries
+
+    loop_thread, docs, queries = asyncio.run(run())
+    assert loop_thread not in loop_threads
+    # Cached rows are float32, the provider's first answer was not
+    assert all(np.allclose(d, expected) for d in docs)
+    assert np.allclose(queries, expected)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (10 * len(TEXTS) + len(TEXTS), len(TEXTS))
+    assert len(inner.embedded) == len(TEXTS)
+
+
+def test_hits_do_not_write_and_eviction_keeps_the_bound(tmp_path):
+    inner = FakeEmbeddings()
+    cache = CachedEmbeddings(inner, "fake", "fake-32", str(tmp_path / "emb.sqlite"), max_entries=100)
+    cache.embed_documents(TEXTS)
+    before = cache._conn.total_changes
+    for _ in range(5):
+        cache.embed_documents(TEXTS)
+    assert cache._conn.total_changes == before  # last_used touches are buffered
+
+    cache.embed_documents([f"other {i}" for i in range(200)])
+    (rows,) = cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert rows <= 100 and cache._rows == rows
+    # The in-memory count is seeded from the table on open
+    reopened = CachedEmbeddings(inner, "fake", "fake-32", str(tmp_path / "emb.sqlite"), max_entries=100)
+    assert reopened._rows == rows
@@ -0,0 +1,56 @@
+"""Per-section retries in the enrichment DAG."""
+import asyncio
+import pytest
+from app import enrichment, knowledge_graph
+from app.config import get_settings
+
+TEXT = "Mice lost bone density in microgravity. " * 50
+
+
+def _fake_section(calls):
+    async def ainvoke(llm, messages, parser, bypass=False):
+        schema = parser.pydantic_object
+        calls.append((schema.__name__, bypass))
+        if schema is enrichment.AudienceSummaries:
+            return schema(abstract_summary="a", scientist_summary="s", investor_summary="i", mission_architect_summary="m")
+        if schema is enrichment.FAQList:
+            return schema(faqs=[{"question": "q?", "answer": "a."}])
+        if schema is enrichment.TagList:
+            return schema(tags=["bone"])
+        raise ValueError("optional section left unparsed")
+    return ainvoke
+
+
+def _flaky_graph(calls, failures):
+    async def ainvoke(llm, messages, parser, bypass=False):
+        calls.append(("KnowledgeGraph", bypass))
+        if sum(1 for name, _ in calls if name == "KnowledgeGraph") <= failures:
+            raise ValueError("unparseable knowledge graph")
+        return parser.pydantic_object(nodes=[{"id": "bone", "type": "Tissue"}], edges=[])
+    return ainvoke
+
+
+def test_knowledge_graph_failure_is_retried(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ENRICH_SECTION_RETRIES", 1)
+    calls = []
+    monkeypatch.setattr(enrichment, "ainvoke_structured", _fake_section(calls))
+    monkeypatch.setattr(knowledge_graph, "ainvoke_structured", _flaky_graph(calls, failures=1))
+
+    out = asyncio.run(enrichment.agenerate_section_summaries("Bone", TEXT, "abstract"))
+
+    assert out.knowledge_graph.nodes == [{"id": "bone", "type": "Tissue"}]
+    assert out.knowledge_gaps is None  # optional sections may still fail on their own
+    # Retried once, bypassing the cache; other sections were not re-run
+    assert [b for name, b in calls if name == "KnowledgeGraph"] == [False, True]
+    assert sum(1 for name, _ in calls if name == "AudienceSummaries") == 1
+
+
+def test_knowledge_graph_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ENRICH_SECTION_RETRIES", 1)
+    calls = []
+    monkeypatch.setattr(enrichment, "ainvoke_structured", _fake_section(calls))
+    monkeypatch.setattr(knowledge_graph, "ainvoke_structured", _flaky_graph(calls, failures=5))
+
+    with pytest.raises(ValueError, match="knowledge graph"):
+        asyncio.run(enrichment.agenerate_section_summaries("Bone", TEXT, "abstract"))
+    assert sum(1 for name, _ in calls if name == "KnowledgeGraph") == 2
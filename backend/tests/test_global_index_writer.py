@@ -0,0 +1,165 @@
+"""Concurrent ingests through the single global-index writer must not lose each other's vectors."""
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app import models, vectorstore
+from app.db import SessionLocal
+from app.ingestion import ingest_publication
+
+N_PAPERS = 12
+
+
+def _paper_text(i: int) -> str:
+    return " ".join(f"Paper {i} sentence {j} reports bone density change {i * 1000 + j}." for j in range(150))
+
+
+def _ingest(i: int) -> int:
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title=f"Paper {i}", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, _paper_text(i))
+        return pub.id
+    finally:
+        db.close()
+
+
+def test_parallel_ingests_are_all_searchable(fresh_store, fake_embeddings):
+    with ThreadPoolExecutor(max_workers=N_PAPERS) as pool:
+        pub_ids = list(pool.map(_ingest, range(N_PAPERS)))
+
+    snap = vectorstore._global_index.snapshot()
+    assert snap.publication_ids == set(pub_ids)
+
+    expected = 0
+    for pid in pub_ids:
+        docs, vectors = vectorstore.publication_chunks_with_vectors(pid)
+        assert len(docs) > 1
+        assert [d.metadata["chunk_id"] for d in docs] == list(range(1, len(docs) + 1))
+        expected += len(docs)
+        # Every chunk is its own nearest neighbour in the global index
+        hits = snap.search_batch(np.asarray(vectors, dtype="float32"), 1)
+        assert [(h[0][0].metadata["publication_id"], h[0][0].metadata["chunk_id"]) for h in hits] == [
+            (pid, d.metadata["chunk_id"]) for d in docs
+        ]
+
+    live = sum(len(rows) for seg in snap.segments for p, rows in seg.postings.items() if seg.is_live(p, snap.tombstones))
+    assert live == expected
+    # Group commit: concurrent batches share segments rather than one write per paper each
+    assert len(snap.segments) <= N_PAPERS
+
+
+def test_reingest_replaces_chunks_of_that_paper_only(fresh_store, fake_embeddings):
+    pub_ids = [_ingest(i) for i in range(3)]
+    before = {pid: len(vectorstore.publication_chunks_with_vectors(pid)[0]) for pid in pub_ids}
+
+    db = SessionLocal()
+    try:
+        pub = db.get(models.Publication, pub_ids[0])
+        ingest_publication(db, pub, _paper_text(0)[:2000], stages=["chunks", "vectors"])
+    finally:
+        db.close()
+
+    after = {pid: len(vectorstore.publication_chunks_with_vectors(pid)[0]) for pid in pub_ids}
+    assert after[pub_ids[0]] < before[pub_ids[0]]
+    assert after[pub_ids[1]] == before[pub_ids[1]] and after[pub_ids[2]] == before[pub_ids[2]]
+
+
+def test_compaction_merges_deltas_before_touching_the_base(fresh_store, fake_embeddings, monkeypatch):
+    settings = vectorstore.settings
+    monkeypatch.setattr(vectorstore, "_maybe_compact", lambda: None)  # compact explicitly below
+    monkeypatch.setattr(settings, "GLOBAL_MAX_DELTA_SEGMENTS", 3)
+    monkeypatch.setattr(settings, "GLOBAL_COMPACT_BASE_RATIO", 100.0)
+    pub_ids = [_ingest(i) for i in range(4)]
+    before = {pid: vectorstore.publication_chunks_with_vectors(pid) for pid in pub_ids}
+    base = vectorstore._global_index.snapshot().segments[0].name
+
+    merged = vectorstore._merge_segments()
+    snap = vectorstore._global_index.snapshot()
+    # Three similar-sized deltas become one; the base is not rewritten
+    assert [seg.name for seg in snap.segments] == [base, merged]
+    assert snap.publication_ids == set(pub_ids)
+    for pid in pub_ids:
+        docs, vectors = vectorstore.publication_chunks_with_vectors(pid)
+        assert [d.page_content for d in docs] == [d.page_content for d in before[pid][0]]
+        assert np.allclose(vectors, before[pid][1])
+
+    # Merged-away segments stay on disk for readers of the old manifest until the grace period ends
+    global_dir = vectorstore._global_dir()
+    retired = [r["name"] for r in vectorstore._read_manifest()["retired"]]
+    assert len(retired) == 3 and all(os.path.isdir(os.path.join(global_dir, n)) for n in retired)
+    monkeypatch.setattr(settings, "GLOBAL_SEGMENT_GRACE_S", 0)
+    full = vectorstore.compact_global_index()
+    assert [seg.name for seg in vectorstore._global_index.snapshot().segments] == [full]
+    assert not any(os.path.isdir(os.path.join(global_dir, n)) for n in retired)
+
+
+def _commit_in_subprocess(first_pub_id: int, n: int) -> None:
+    # Runs in a spawned process, like the bulk CLI writing next to the API server
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import FakeEmbeddings
+
+    vectorstore.get_embeddings = lambda: FakeEmbeddings(size=8)
+    vectorstore._maybe_compact = lambda: None
+    for pid in range(first_pub_id, first_pub_id + n):
+        doc = Document(page_content=f"paper {pid}", metadata={"publication_id": pid, "chunk_id": 1})
+        vectorstore._commit_segment([doc], np.full((1, 8), pid, dtype="float32"))
+
+
+def test_writers_in_separate_processes_do_not_drop_commits(fresh_store, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(vectorstore, "_maybe_compact", lambda: None)
+    vectorstore._read_manifest()
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_commit_in_subprocess, args=(100 * w, 5)) for w in range(1, 4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    manifest = vectorstore._read_manifest()
+    assert len(manifest["segments"]) == len(set(manifest["segments"])) == 15
+    assert vectorstore._global_index.snapshot().publication_ids == {100 * w + i for w in range(1, 4) for i in range(5)}
+
+
+def test_group_commit_keeps_docs_without_publication_id(fresh_store, fake_embeddings):
+    from langchain_core.documents import Document
+
+    docs = [Document(page_content=f"loose note {i}", metadata={"chunk_id": i}) for i in range(1, 4)]
+    futures = [vectorstore._writer.submit([d], fake_embeddings.embed_documents([d.page_content])) for d in docs]
+    for f in futures:
+        f.result()
+    snap = vectorstore._global_index.snapshot()
+    assert sum(seg.vs.index.ntotal for seg in snap.segments) == 3
+
+
+def test_snapshot_reparses_the_manifest_only_when_it_changes(fresh_store, fake_embeddings, monkeypatch):
+    _ingest(0)
+    vectorstore._global_index.snapshot()
+    reads = []
+    read = vectorstore._read_manifest
+    monkeypatch.setattr(vectorstore, "_read_manifest", lambda: reads.append(1) or read())
+    for _ in range(20):
+        vectorstore._global_index.snapshot()
+    assert reads == []
+
+    pid = _ingest(1)
+    assert pid in vectorstore._global_index.snapshot().publication_ids
+    assert reads
+
+
+def test_reingest_without_chunks_hides_the_old_ones(fresh_store, fake_embeddings):
+    pub_ids = [_ingest(i) for i in range(2)]
+    db = SessionLocal()
+    try:
+        pub = db.get(models.Publication, pub_ids[0])
+        ingest_publication(db, pub, "", stages=["chunks", "vectors"])  # e.g. extraction came back empty
+    finally:
+        db.close()
+
+    snap = vectorstore._global_index.snapshot()
+    assert snap.publication_ids == {pub_ids[1]}
+    assert vectorstore.publication_chunks_with_vectors(pub_ids[0])[0] == []
+    assert all(h[0].metadata["publication_id"] == pub_ids[1] for h in snap.search(np.ones((1, 32), dtype="float32"), 5))
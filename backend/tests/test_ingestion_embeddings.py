@@ -0,0 +1,132 @@
+"""Ingestion embeds every chunk exactly once and reuses the vectors for the index."""
+from collections import Counter
+import numpy as np
+from app import ingestion, models, vectorstore
+from app.chunking import chunk_text
+from app.db import SessionLocal
+from app.ingestion import ingest_publication
+from app.reingest import reingest
+
+TEXT = " ".join(f"Sentence {i} on osteoblast activity in spaceflight number {i}." for i in range(400))
+
+
+def test_each_chunk_is_embedded_once(fresh_store, fake_embeddings):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Osteoblasts", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, TEXT)
+        pub_id = pub.id
+    finally:
+        db.close()
+
+    chunks = [d.page_content for d in chunk_text(TEXT)]
+    counts = Counter(fake_embeddings.embedded)
+    assert len(chunks) > 1
+    assert all(counts[c] == 1 for c in chunks)
+    # Nothing else but the chunks and the FAQ questions reached the provider
+    assert sum(counts.values()) == len(chunks) + 1
+
+    # The index holds exactly the vectors computed during that single pass
+    docs, vectors = vectorstore.publication_chunks_with_vectors(pub_id)
+    assert [d.page_content for d in docs] == chunks
+    expected = np.asarray(fake_embeddings.embed_documents(chunks), dtype="float32")
+    assert np.allclose(vectors, expected)
+
+
+def test_vectors_only_reingest_embeds_once(fresh_store, fake_embeddings):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Osteoblasts", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, TEXT)
+        fake_embeddings.embedded.clear()
+        ingest_publication(db, pub, TEXT, stages=["vectors"])
+    finally:
+        db.close()
+
+    chunks = [d.page_content for d in chunk_text(TEXT)]
+    counts = Counter(fake_embeddings.embedded)
+    assert all(counts[c] == 1 for c in chunks)
+
+
+def test_stale_reingest_reembeds_legacy_publication_without_text(fresh_store, fake_embeddings, monkeypatch):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Osteoblasts", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, TEXT)
+        # Ingested before text and fingerprints were stored, and its upload is gone
+        pub.full_text = None
+        pub.ingest_fingerprints = None
+        db.commit()
+        pub_id = pub.id
+    finally:
+        db.close()
+
+    monkeypatch.setattr(ingestion.settings, "EMBED_MODEL", "another-model")
+    fake_embeddings.embedded.clear()
+    reingest(stale_only=True)
+    chunks = [d.page_content for d in chunk_text(TEXT)]
+    assert all(Counter(fake_embeddings.embedded)[c] == 1 for c in chunks)
+    assert [d.page_content for d in vectorstore.publication_chunks_with_vectors(pub_id)[0]] == chunks
+
+    # The re-embed is recorded, so the next stale-only run has nothing to do
+    fake_embeddings.embedded.clear()
+    reingest(stale_only=True)
+    assert fake_embeddings.embedded == []
+
+
+def test_stale_reingest_after_upgrade_makes_no_summary_calls(fresh_store, fake_embeddings, monkeypatch):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Osteoblasts", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, TEXT)
+        pub.ingest_fingerprints = None  # summarized before fingerprints were recorded
+        db.commit()
+        pub_id = pub.id
+    finally:
+        db.close()
+
+    calls = []
+    monkeypatch.setattr(ingestion, "enrich_publication", lambda *a, **kw: calls.append(a))
+    monkeypatch.setattr(ingestion.settings, "EMBED_MODEL", "another-model")
+    reingest(stale_only=True)
+    assert calls == []
+    db = SessionLocal()
+    try:
+        assert ingestion.stale_stages(db.get(models.Publication, pub_id), TEXT) == set()
+    finally:
+        db.close()
+
+
+def test_duplicate_of_legacy_only_publication_gets_searchable_chunks(fresh_store, fake_embeddings):
+    from langchain_community.vectorstores import FAISS
+
+    chunks = [d.page_content for d in chunk_text(TEXT)]
+    db = SessionLocal()
+    try:
+        src = models.Publication(title="Osteoblasts", metadata_json={}, others_data={}, content_sha256="abc",
+                                 summary_of_abstract="a", full_text=TEXT)
+        dup = models.Publication(title="Osteoblasts (copy)", metadata_json={}, others_data={}, content_sha256="abc")
+        db.add_all([src, dup])
+        db.commit()
+        # Ingested before the shared index: only a per-publication FAISS directory
+        FAISS.from_texts(chunks, fake_embeddings).save_local(vectorstore._pub_dir(src.id))
+
+        found = ingestion.find_ingested_duplicate(db, "abc", exclude_id=dup.id)
+        assert found is not None and found.id == src.id
+        ingestion.reuse_ingested_publication(db, found, dup)
+        dup_id = dup.id
+    finally:
+        db.close()
+
+    docs, vectors = vectorstore.publication_chunks_with_vectors(dup_id)
+    assert [d.page_content for d in docs] == chunks
+    assert dup_id in vectorstore._global_index.snapshot().publication_ids
+    assert np.allclose(vectors, np.asarray(fake_embeddings.embed_documents(chunks), dtype="float32"))
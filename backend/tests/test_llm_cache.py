@@ -0,0 +1,59 @@
+"""The persistent structured-output LLM cache."""
+import asyncio
+import threading
+from langchain_core.messages import HumanMessage
+from langchain.output_parsers import PydanticOutputParser
+from pydantic import BaseModel
+from app import llm_cache
+from app.llm_cache import LLMResponseCache
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def test_puts_keep_the_bound_without_counting(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_s=0, max_entries=100)
+    for i in range(30):
+        cache.put("fake", "m", f"h{i}", Answer(text=str(i)))
+    before = cache._conn.total_changes
+    for _ in range(5):
+        for i in range(30):
+            assert cache.get("fake", "m", f"h{i}", Answer).text == str(i)
+    assert cache._conn.total_changes == before  # last_used touches are buffered
+
+    cache.put("fake", "m", "h0", Answer(text="fresh"))  # a bypass refresh is not a new row
+    assert cache._rows == 30 and cache.get("fake", "m", "h0", Answer).text == "fresh"
+    for i in range(200):
+        cache.put("fake", "m", f"other{i}", Answer(text=str(i)))
+    (rows,) = cache._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+    assert rows <= 100 and cache._rows == rows
+    assert LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_s=0, max_entries=100)._rows == rows
+
+
+def test_async_cache_calls_run_off_the_event_loop(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl_s=0, max_entries=0)
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    cache_threads = set()
+    get, put = cache.get, cache.put
+    monkeypatch.setattr(cache, "get", lambda *a: cache_threads.add(threading.get_ident()) or get(*a))
+    monkeypatch.setattr(cache, "put", lambda *a: cache_threads.add(threading.get_ident()) or put(*a))
+
+    class FakeLLM:
+        calls = 0
+
+        async def ainvoke(self, messages):
+            FakeLLM.calls += 1
+            return HumanMessage(content='{"text": "hi"}')
+
+    async def run():
+        parser = PydanticOutputParser(pydantic_object=Answer)
+        messages = [HumanMessage(content="question")]
+        first = await llm_cache.ainvoke_structured(FakeLLM, messages, parser)
+        second = await llm_cache.ainvoke_structured(FakeLLM, messages, parser)
+        return threading.get_ident(), first, second
+
+    loop_thread, first, second = asyncio.run(run())
+    assert first == second == Answer(text="hi")
+    assert FakeLLM.calls == 1
+    assert cache_threads and loop_thread not in cache_threads
@@ -0,0 +1,87 @@
+"""The per-provider limiter shared by sync and async callers."""
+import asyncio
+import threading
+from app.llm_clients import _ProviderLimiter
+
+
+def test_async_waiters_are_served_in_order():
+    limiter = _ProviderLimiter("fake", 1)
+    order = []
+
+    async def call(i: int):
+        await limiter.aacquire()
+        order.append(i)
+        await asyncio.sleep(0)
+        limiter.release(0.0, True)
+
+    async def run():
+        await limiter.aacquire()
+        tasks = [asyncio.create_task(call(i)) for i in range(20)]
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 20
+        limiter.release(0.0, True)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == list(range(20))
+    assert limiter.stats()["in_flight"] == limiter.stats()["queue_depth"] == 0
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    limiter = _ProviderLimiter("fake", 1)
+
+    async def run():
+        await limiter.aacquire()
+        cancelled = asyncio.create_task(limiter.aacquire())
+        served = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        limiter.release(0.0, True)  # hands the slot to `cancelled` ...
+        cancelled.cancel()  # ... which is cancelled before it runs
+        await asyncio.wait_for(served, 1)
+        limiter.release(0.0, True)
+
+    asyncio.run(run())
+    assert limiter.stats()["in_flight"] == limiter.stats()["queue_depth"] == 0
+    assert limiter._free == 1
+
+
+def test_cap_holds_across_threads_and_loops():
+    limiter = _ProviderLimiter("fake", 3)
+    peak, current, lock = [0], [0], threading.Lock()
+
+    def enter():
+        with lock:
+            current[0] += 1
+            peak[0] = max(peak[0], current[0])
+
+    def leave():
+        with lock:
+            current[0] -= 1
+        limiter.release(0.0, True)
+
+    def sync_caller():
+        for _ in range(20):
+            limiter.acquire()
+            enter()
+            leave()
+
+    def async_caller():
+        async def one():
+            await limiter.aacquire()
+            enter()
+            await asyncio.sleep(0.001)
+            leave()
+
+        async def run():
+            await asyncio.gather(*[one() for _ in range(20)])
+
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=f) for f in (sync_caller, async_caller) * 3]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert not any(t.is_alive() for t in threads)
+    assert peak[0] <= 3
+    assert limiter.stats()["calls"] == 120 and limiter._free == 3
@@ -0,0 +1,112 @@
+"""Load test: hundreds of concurrent QA sessions must not starve the catalogue endpoints."""
+import asyncio
+import itertools
+import time
+import httpx
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from app import llm_clients, models, rag_graph
+from app.db import SessionLocal
+from app.ingestion import ingest_publication
+
+SESSIONS = 300
+LLM_LATENCY_S = 1.0
+_in_flight = [0]
+
+
+class SlowChatModel(GenericFakeChatModel):
+    """Answers after LLM_LATENCY_S without blocking the event loop (like a remote provider)."""
+
+    async def _agenerate(self, *args, **kwargs):
+        _in_flight[0] += 1
+        try:
+            await asyncio.sleep(LLM_LATENCY_S)
+        finally:
+            _in_flight[0] -= 1
+        return await super()._agenerate(*args, **kwargs)
+
+
+def test_concurrent_qa_does_not_block_catalogue(fresh_store, fake_embeddings, monkeypatch):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Bone loss in mice", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, "Mice lost bone density in microgravity. " * 200)
+        pub_id = pub.id
+    finally:
+        db.close()
+
+    client = llm_clients.ManagedChatModel(
+        lambda: SlowChatModel(messages=itertools.repeat(AIMessage("Bone density dropped [1]."))),
+        llm_clients._ProviderLimiter("fake", SESSIONS),
+    )
+    monkeypatch.setattr(rag_graph, "_llm", lambda: client)
+    from app.main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as c:
+            async def ask(i: int) -> int:
+                r = await c.post("/qa/single-doc", json={"publication_id": pub_id, "question": f"bone change {i}?", "k": 3})
+                return r.status_code
+
+            async def browse() -> list:
+                # Measure while every session is parked on the LLM, i.e. the server is fully loaded
+                deadline = time.perf_counter() + 30
+                while _in_flight[0] < SESSIONS and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.005)
+                assert _in_flight[0] == SESSIONS
+                latencies = []
+                for path in ["/publications", "/categories"] * 5:
+                    t0 = time.perf_counter()
+                    r = await c.get(path)
+                    assert r.status_code == 200
+                    latencies.append(time.perf_counter() - t0)
+                return latencies
+
+            for path in ("/publications", "/categories"):  # warm adapters and compiled queries
+                assert (await c.get(path)).status_code == 200
+
+            t0 = time.perf_counter()
+            *codes, latencies = await asyncio.gather(*[ask(i) for i in range(SESSIONS)], browse())
+            return codes, latencies, time.perf_counter() - t0
+
+    codes, latencies, wall = asyncio.run(run())
+    print(f"{SESSIONS} QA sessions in {wall:.2f}s; catalogue max latency {max(latencies) * 1000:.0f}ms")
+
+    assert codes == [200] * SESSIONS
+    # A 40-thread pool would need SESSIONS / 40 LLM round trips; async serves them in about one
+    assert wall < SESSIONS / 40 * LLM_LATENCY_S
+    # Catalogue requests never wait behind an LLM call
+    assert max(latencies) < LLM_LATENCY_S / 5
+
+
+def test_cache_miss_embeds_the_question_once(fresh_store, fake_embeddings, monkeypatch):
+    db = SessionLocal()
+    try:
+        pub = models.Publication(title="Bone loss in mice", metadata_json={}, others_data={})
+        db.add(pub)
+        db.commit()
+        ingest_publication(db, pub, "Mice lost bone density in microgravity. " * 200)
+        pub_id = pub.id
+    finally:
+        db.close()
+
+    client = llm_clients.ManagedChatModel(
+        lambda: GenericFakeChatModel(messages=itertools.repeat(AIMessage("Bone density dropped [1]."))),
+        llm_clients._ProviderLimiter("fake", 1),
+    )
+    monkeypatch.setattr(rag_graph, "_llm", lambda: client)
+    from app.main import app
+
+    async def ask():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as c:
+            return await c.post("/qa/single-doc", json={"publication_id": pub_id, "question": "Did bone density change?", "k": 3})
+
+    fake_embeddings.embedded.clear()
+    r = asyncio.run(ask())
+    assert r.status_code == 200 and r.json()["source"] == "rag"
+    # One provider call serves both the FAQ / answer-cache lookup and retrieval
+    assert fake_embeddings.embedded == ["Did bone density change?"]